@@ -0,0 +1,132 @@
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy.orm import Session
+
+import importer
+import models
+import reset_db
+
+PREFIXES = ("Captain", "Doctor", "Iron", "Black", "Scarlet", "Silver", "Night", "Star", "Ghost", "Moon",
+            "Storm", "Shadow", "Crimson", "Atomic", "Cosmic", "Thunder", "Winter", "Phantom", "Steel", "Venom")
+SUFFIXES = ("Man", "Woman", "Widow", "Witch", "Hawk", "Knight", "Surfer", "Panther", "Falcon", "Wolf",
+            "Strange", "Marvel", "Hammer", "Spider", "Fist", "Blade", "Rider", "Shield", "Storm", "Wasp")
+FIRST_NAMES = ("Peter", "Tony", "Natasha", "Wanda", "Steve", "Carol", "Bruce", "Stephen", "Matt", "Jessica",
+               "Luke", "Danny", "Scott", "Hope", "Clint", "Kate", "Sam", "Bucky", "Jean", "Logan")
+LAST_NAMES = ("Parker", "Stark", "Romanoff", "Maximoff", "Rogers", "Danvers", "Banner", "Strange", "Murdock",
+              "Jones", "Cage", "Rand", "Lang", "Van Dyne", "Barton", "Bishop", "Wilson", "Barnes", "Grey", "Howlett")
+CITIES = ("New York", "Queens", "Wakanda", "Sokovia", "Asgard", "Brooklyn", "Boston", "Chicago", "Tokyo", "Madripoor")
+TEAM_WORDS = ("Avengers", "Defenders", "Guardians", "Legion", "Squad", "Force", "Alliance", "Order", "Brigade", "League")
+ALIGNMENTS = ("good", "evil", "neutral")
+
+def _created(rng: random.Random) -> datetime:
+    return datetime(2020, 1, 1) + timedelta(seconds=rng.randrange(5 * 365 * 86400))
+
+def characters(rng: random.Random, count: int) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+            "alias": f"{rng.choice(PREFIXES)} {rng.choice(SUFFIXES)} {i}",
+            "alignment": rng.choice(ALIGNMENTS),
+            "first_appearance": date(1940, 1, 1) + timedelta(days=rng.randrange(30000)),
+            "description": f"Personaje sintético número {i}",
+            "active": rng.random() >= 0.05,
+            "created_at": _created(rng),
+        }
+
+def teams(rng: random.Random, count: int) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": f"{rng.choice(PREFIXES)} {rng.choice(TEAM_WORDS)} {i}",
+            "founded_date": date(1960, 1, 1) + timedelta(days=rng.randrange(20000)),
+            "description": f"Equipo sintético número {i}",
+            "active": rng.random() >= 0.05,
+            "created_at": _created(rng),
+        }
+
+def identities(rng: random.Random, character_count: int, ratio: float) -> Iterator[Dict]:
+    for character_id in range(1, character_count + 1):
+        if rng.random() < ratio:
+            yield {
+                "character_id": character_id,
+                "real_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "birth_date": date(1900, 1, 1) + timedelta(days=rng.randrange(40000)),
+                "place_of_birth": rng.choice(CITIES),
+            }
+
+def memberships(rng: random.Random, character_count: int, team_count: int, per_character: float) -> Iterator[Dict]:
+    if not team_count:
+        return
+    for character_id in range(1, character_count + 1):
+        # Entre 0 y 2*per_character equipos distintos por personaje
+        k = min(team_count, rng.randint(0, round(2 * per_character)))
+        for team_id in rng.sample(range(1, team_count + 1), k):
+            yield {"character_id": character_id, "team_id": team_id}
+
+def _batches(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _load(db: Session, model, rows: Iterator[Dict], batch_size: int) -> int:
+    # Todo en la transacción del TRUNCATE: se confirma en reset_db.finish
+    total = 0
+    for batch in _batches(rows, batch_size):
+        importer.bulk_insert(db, model, batch)
+        total += len(batch)
+    return total
+
+def generate(db: Session, character_count: int, team_count: int, identity_ratio: float = 0.7,
+             memberships_per_character: float = 1.5, seed: int = 42, batch_size: int = 5000) -> Dict:
+    # Misma semilla y tamaños => mismo catálogo, para comparar entre commits
+    rng = random.Random(seed)
+    reset_db.truncate(db)
+    summary = {"seed": seed}
+    start = time.perf_counter()
+    summary["teams"] = _load(db, models.Team, teams(rng, team_count), batch_size)
+    summary["characters"] = _load(db, models.Character, characters(rng, character_count), batch_size)
+    summary["identities"] = _load(db, models.SecretIdentity, identities(rng, character_count, identity_ratio), batch_size)
+    summary["memberships"] = _load(
+        db, models.CharacterTeam, memberships(rng, character_count, team_count, memberships_per_character), batch_size
+    )
+    for table in (models.Team.__tablename__, models.Character.__tablename__,
+                  models.SecretIdentity.__tablename__, models.CharacterTeam.__tablename__):
+        importer.sync_sequence(db, table)
+    reset_db.finish(db)
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un catálogo sintético (borra los datos actuales)")
+    parser.add_argument("--characters", type=int, default=10000)
+    parser.add_argument("--teams", type=int, help="por defecto, un equipo cada 50 personajes")
+    parser.add_argument("--identity-ratio", type=float, default=0.7)
+    parser.add_argument("--memberships", type=float, default=1.5, help="equipos promedio por personaje")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    import migrations
+    from database import SessionLocal, engine
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        result = generate(
+            db, args.characters, args.teams if args.teams is not None else max(1, args.characters // 50),
+            identity_ratio=args.identity_ratio, memberships_per_character=args.memberships,
+            seed=args.seed, batch_size=args.batch_size,
+        )
+    finally:
+        db.close()
+    print(json.dumps(result))
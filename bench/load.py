@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import fnmatch
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench import report
+
+WORDS = ("spider", "iron", "captain", "widow", "storm", "night", "parker", "stark", "avengers", "xyz")
+
+@dataclass
+class Context:
+    characters: int
+    teams: int
+    identities: int
+    png: bytes
+    rng: random.Random
+
+    def character_id(self) -> int:
+        return self.rng.randint(1, max(1, self.characters))
+
+    def team_id(self) -> int:
+        return self.rng.randint(1, max(1, self.teams))
+
+    def identity_id(self) -> int:
+        return self.rng.randint(1, max(1, self.identities))
+
+# Cada escenario hace su preparación (sin medir) y devuelve la petición a medir
+Make = Callable[[httpx.AsyncClient, Context], Awaitable[Awaitable[httpx.Response]]]
+
+@dataclass
+class Scenario:
+    name: str
+    make: Make
+    expected: Tuple[int, ...] = (200,)
+    share: float = 1.0  # fracción de --requests (los escenarios pesados piden menos)
+
+SCENARIOS: List[Scenario] = []
+
+def scenario(name: str, expected: Tuple[int, ...] = (200,), share: float = 1.0):
+    def decorator(make: Make):
+        SCENARIOS.append(Scenario(name, make, expected, share))
+        return make
+    return decorator
+
+def _character_form(ctx: Context) -> Dict:
+    n = ctx.rng.randrange(10 ** 9)
+    return {"name": f"Bench {n}", "alias": f"Bench Alias {n}", "alignment": ctx.rng.choice(("good", "evil", "neutral"))}
+
+async def _new_character(client: httpx.AsyncClient, ctx: Context) -> int:
+    return (await client.post("/api/characters", data=_character_form(ctx))).json()["id"]
+
+# -------------------- API: lecturas --------------------
+@scenario("api.characters.list")
+async def _(client, ctx):
+    return client.get("/api/characters", params={"limit": 100, "skip": ctx.rng.randrange(max(1, ctx.characters - 100))})
+
+@scenario("api.characters.list.sparse")
+async def _(client, ctx):
+    return client.get("/api/characters", params={
+        "limit": 100, "skip": ctx.rng.randrange(max(1, ctx.characters - 100)), "fields": "id,name,alias,image_url",
+    })
+
+@scenario("api.characters.cursor")
+async def _(client, ctx):
+    from pagination import encode_cursor
+    return client.get("/api/characters", params={"limit": 100, "after": encode_cursor(ctx.character_id())})
+
+@scenario("api.characters.search")
+async def _(client, ctx):
+    return client.get("/api/characters", params={"q": ctx.rng.choice(WORDS), "limit": 50})
+
+@scenario("api.characters.detail", expected=(200, 404))
+async def _(client, ctx):
+    return client.get(f"/api/characters/{ctx.character_id()}")
+
+@scenario("api.teams.list")
+async def _(client, ctx):
+    return client.get("/api/teams", params={"limit": 100})
+
+@scenario("api.teams.list.members")
+async def _(client, ctx):
+    return client.get("/api/teams", params={"limit": 20, "fields": "id,name", "expand": "members"})
+
+@scenario("api.teams.search")
+async def _(client, ctx):
+    return client.get("/api/teams", params={"q": ctx.rng.choice(WORDS)})
+
+@scenario("api.teams.detail", expected=(200, 404))
+async def _(client, ctx):
+    return client.get(f"/api/teams/{ctx.team_id()}")
+
+@scenario("api.identities.list")
+async def _(client, ctx):
+    return client.get("/api/identities", params={"limit": 100})
+
+@scenario("api.identities.detail", expected=(200, 404))
+async def _(client, ctx):
+    return client.get(f"/api/identities/{ctx.identity_id()}")
+
+@scenario("api.character_team.list")
+async def _(client, ctx):
+    return client.get("/api/character_team", params={"limit": 100})
+
+@scenario("api.character_team.list.sparse")
+async def _(client, ctx):
+    return client.get("/api/character_team", params={"limit": 100, "fields": "character_id,team_id"})
+
+@scenario("api.report.stats")
+async def _(client, ctx):
+    return client.get("/api/report/stats")
+
+@scenario("api.report.pdf", share=0.05)
+async def _(client, ctx):
+    return client.get("/api/report/pdf")
+
+@scenario("api.export.characters", share=0.05)
+async def _(client, ctx):
+    return client.get("/api/export/characters", params={"format": "ndjson"})
+
+# -------------------- API: escrituras --------------------
+@scenario("api.characters.create")
+async def _(client, ctx):
+    return client.post("/api/characters", data=_character_form(ctx))
+
+@scenario("api.characters.upload")
+async def _(client, ctx):
+    files = {"image": ("bench.png", ctx.png, "image/png")}
+    return client.post("/api/characters", data=_character_form(ctx), files=files)
+
+@scenario("api.characters.update", expected=(200, 404))
+async def _(client, ctx):
+    return client.put(f"/api/characters/{ctx.character_id()}", json=_character_form(ctx))
+
+@scenario("api.characters.patch", expected=(200, 404))
+async def _(client, ctx):
+    return client.patch(f"/api/characters/{ctx.character_id()}", json={"alias": f"Bench Alias {ctx.rng.randrange(10 ** 9)}"})
+
+@scenario("api.characters.bulk", share=0.2)
+async def _(client, ctx):
+    ids = [ctx.character_id() for _ in range(20)]
+    await client.post("/api/characters/bulk/delete", json={"ids": ids})
+    return client.post("/api/characters/bulk/restore", json={"ids": ids})
+
+@scenario("api.characters.delete", expected=(200, 404))
+async def _(client, ctx):
+    return client.delete(f"/api/characters/{ctx.character_id()}")
+
+@scenario("api.characters.restore", expected=(200, 404))
+async def _(client, ctx):
+    return client.put(f"/api/characters/{ctx.character_id()}/restore")
+
+@scenario("api.teams.create")
+async def _(client, ctx):
+    return client.post("/api/teams", data={"name": f"Bench Team {ctx.rng.randrange(10 ** 9)}"})
+
+@scenario("api.teams.update", expected=(200, 404))
+async def _(client, ctx):
+    return client.put(f"/api/teams/{ctx.team_id()}", json={"name": f"Bench Team {ctx.rng.randrange(10 ** 9)}"})
+
+@scenario("api.teams.patch", expected=(200, 404))
+async def _(client, ctx):
+    return client.patch(f"/api/teams/{ctx.team_id()}", json={"description": f"Bench {ctx.rng.randrange(10 ** 9)}"})
+
+@scenario("api.teams.members", expected=(200, 404))
+async def _(client, ctx):
+    add = [ctx.character_id() for _ in range(3)]
+    remove = [ctx.character_id() for _ in range(3)]
+    return client.put(f"/api/teams/{ctx.team_id()}/members", json={"add": add, "remove": remove})
+
+@scenario("api.identities.create")
+async def _(client, ctx):
+    character_id = await _new_character(client, ctx)
+    return client.post("/api/identities", json={"character_id": character_id, "real_name": "Bench Identity"})
+
+@scenario("api.identities.update", expected=(200, 404))
+async def _(client, ctx):
+    identity_id = ctx.identity_id()
+    current = await client.get(f"/api/identities/{identity_id}")
+    if current.status_code != 200:
+        # Identidad borrada por otro escenario: se mide el 404
+        return client.get(f"/api/identities/{identity_id}")
+    body = {"character_id": current.json()["character_id"], "real_name": f"Bench {ctx.rng.randrange(10 ** 9)}"}
+    return client.put(f"/api/identities/{identity_id}", json=body)
+
+@scenario("api.identities.delete")
+async def _(client, ctx):
+    character_id = await _new_character(client, ctx)
+    identity = (await client.post("/api/identities", json={"character_id": character_id, "real_name": "Bench"})).json()
+    return client.delete(f"/api/identities/{identity['id']}")
+
+@scenario("api.character_team.create")
+async def _(client, ctx):
+    character_id = await _new_character(client, ctx)
+    return client.post("/api/character_team", json={"character_id": character_id, "team_id": ctx.team_id()})
+
+@scenario("api.character_team.delete")
+async def _(client, ctx):
+    character_id = await _new_character(client, ctx)
+    relation = (await client.post("/api/character_team", json={"character_id": character_id, "team_id": ctx.team_id()})).json()
+    return client.delete(f"/api/character_team/{relation['id']}")
+
+@scenario("api.import.characters", share=0.1)
+async def _(client, ctx):
+    buffer = io.StringIO()
+    buffer.write("name,alias,alignment\n")
+    for _ in range(100):
+        form = _character_form(ctx)
+        buffer.write(f"{form['name']},{form['alias']},{form['alignment']}\n")
+    files = {"file": ("bench.csv", buffer.getvalue().encode(), "text/csv")}
+    return client.post("/api/import/characters", files=files)
+
+# -------------------- HTML --------------------
+PAGES = ("/", "/characters", "/characters/new", "/teams", "/teams/new", "/identities", "/identities/new",
+         "/character_team/list", "/character_team/new", "/dashboard")
+
+def _page(path: str) -> Make:
+    async def make(client, ctx):
+        return client.get(path)
+    return make
+
+for _path in PAGES:
+    SCENARIOS.append(Scenario(f"html.get {_path}", _page(_path), share=0.2))
+
+@scenario("html.get /characters/edit/{id}", expected=(200, 404), share=0.2)
+async def _(client, ctx):
+    return client.get(f"/characters/edit/{ctx.character_id()}")
+
+@scenario("html.post /characters/new", expected=(303,), share=0.2)
+async def _(client, ctx):
+    return client.post("/characters/new", data=_character_form(ctx))
+
+@scenario("html.post /teams/new", expected=(303,), share=0.2)
+async def _(client, ctx):
+    return client.post("/teams/new", data={"name": f"Bench Team {ctx.rng.randrange(10 ** 9)}"})
+
+# -------------------- Ejecución --------------------
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, sc: Scenario, requests: int,
+                       concurrency: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        await (await sc.make(client, ctx))
+    latencies: List[float] = []
+    errors = 0
+    remaining = [max(1, int(requests * sc.share))]
+
+    async def worker():
+        nonlocal errors
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            request = await sc.make(client, ctx)
+            start = time.perf_counter()
+            try:
+                response = await request
+                ok = response.status_code in sc.expected
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return report.summarize(latencies, errors, time.perf_counter() - start)
+
+def _png(size: int = 512) -> bytes:
+    from PIL import Image
+    img = Image.frombytes("RGB", (size, size), random.Random(0).randbytes(size * size * 3))
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _select(patterns: List[str], skip: List[str]) -> List[Scenario]:
+    selected = [s for s in SCENARIOS if not patterns or any(fnmatch.fnmatch(s.name, p) for p in patterns)]
+    return [s for s in selected if not any(fnmatch.fnmatch(s.name, p) for p in skip)]
+
+async def run(client: httpx.AsyncClient, scenarios: List[Scenario], requests: int, concurrency: int,
+              warmup: int, seed: int) -> Dict:
+    totals = (await client.get("/api/report/stats")).json()
+    ctx = Context(
+        characters=totals["characters"], teams=totals["teams"], identities=totals["identities"],
+        png=_png(), rng=random.Random(seed),
+    )
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "catalog": {"characters": ctx.characters, "teams": ctx.teams, "identities": ctx.identities},
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed": seed,
+        },
+        "scenarios": {},
+    }
+    for sc in scenarios:
+        result["scenarios"][sc.name] = await run_scenario(client, ctx, sc, requests, concurrency, warmup)
+    return result
+
+def _in_process_app():
+    # Almacenamiento local en un directorio temporal: nunca se sube nada a Supabase
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    os.environ.setdefault("MEDIA_ROOT", tempfile.mkdtemp(prefix="bench_media_"))
+    import main
+    return main.app
+
+async def _main(args):
+    scenarios = _select(args.only, args.skip)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+            result = await run(client, scenarios, args.requests, args.concurrency, args.warmup, args.seed)
+    else:
+        app = _in_process_app()
+        # ASGITransport no ejecuta el lifespan: se entra a mano para que el arranque sea el de un worker
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+                result = await run(client, scenarios, args.requests, args.concurrency, args.warmup, args.seed)
+    if not args.url:
+        from database import engine
+        result["meta"]["database"] = engine.dialect.name
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga sobre la API y las páginas HTML")
+    parser.add_argument("--url", help="servidor ya levantado; por defecto la app corre en el mismo proceso")
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", default=[], help="patrón de escenarios (fnmatch)")
+    parser.add_argument("--skip", action="append", default=[], help="patrón de escenarios a omitir")
+    parser.add_argument("--output", help="archivo JSON para comparar con bench.report compare")
+    args = parser.parse_args()
+
+    result = asyncio.run(_main(args))
+    report.print_table(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
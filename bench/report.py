@@ -0,0 +1,76 @@
+import argparse
+import json
+import math
+import sys
+from typing import Dict, List, Sequence
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    # Rango más cercano: siempre devuelve una muestra real
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict:
+    values = sorted(latencies)
+    result = {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+    }
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = round(percentile(values, p) * 1000, 3)
+    return result
+
+def print_table(report: Dict, out=sys.stdout):
+    header = f"{'escenario':<32} {'req':>6} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for name, s in report["scenarios"].items():
+        print(f"{name:<32} {s['requests']:>6} {s['errors']:>5} {s['throughput_rps']:>9.1f} "
+              f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f}", file=out)
+
+def compare(base: Dict, head: Dict, threshold: float = 0.10, metric: str = "p95_ms", out=sys.stdout) -> List[str]:
+    # Devuelve los escenarios cuya métrica empeoró más que threshold (fracción)
+    regressions = []
+    for key in ("catalog", "requests", "concurrency", "database"):
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"aviso: {key} distinto ({base['meta'].get(key)} -> {head['meta'].get(key)})", file=out)
+    print(f"{'escenario':<32} {'base':>10} {'head':>10} {'cambio':>8}", file=out)
+    for name, h in head["scenarios"].items():
+        b = base["scenarios"].get(name)
+        if b is None:
+            print(f"{name:<32} {'-':>10} {h[metric]:>10.2f} {'nuevo':>8}", file=out)
+            continue
+        change = (h[metric] - b[metric]) / b[metric] if b[metric] else 0.0
+        flag = ""
+        if change > threshold or h["errors"] > b["errors"]:
+            regressions.append(name)
+            flag = "  <-- regresión"
+        print(f"{name:<32} {b[metric]:>10.2f} {h[metric]:>10.2f} {change:>+8.1%}{flag}", file=out)
+    return regressions
+
+def load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Muestra o compara reportes de benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show")
+    show.add_argument("report")
+    diff = sub.add_parser("compare")
+    diff.add_argument("base")
+    diff.add_argument("head")
+    diff.add_argument("--threshold", type=float, default=0.10)
+    diff.add_argument("--metric", default="p95_ms", choices=[f"p{p}_ms" for p in PERCENTILES] + ["mean_ms"])
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print_table(load(args.report))
+    else:
+        found = compare(load(args.base), load(args.head), args.threshold, args.metric)
+        sys.exit(1 if found else 0)
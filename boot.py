@@ -0,0 +1,54 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Se loguea junto a las líneas de arranque de uvicorn; el logger raíz no
+# tiene handlers y descartaría los mensajes INFO
+logger = logging.getLogger("uvicorn.error")
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+
+# Fases del arranque (import de main y lifespan) y, aparte, lo que se
+# inicializa de forma diferida en el primer uso
+PHASES: Dict[str, float] = {}
+LAZY: Dict[str, float] = {}
+_ready: Dict[str, float] = {}
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASES[name] = time.perf_counter() - start
+
+@contextmanager
+def lazy(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            LAZY[name] = elapsed
+        logger.info("Inicialización diferida de %s: %.1f ms", name, elapsed * 1000)
+
+def ready():
+    # Llamar al terminar el arranque: fija el total y lo loguea una vez
+    if _ready:
+        return
+    _ready["total"] = time.perf_counter() - _started
+    detail = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in PHASES.items())
+    logger.info("Arranque en %.1f ms (%s)", _ready["total"] * 1000, detail)
+
+def summary() -> Dict:
+    with _lock:
+        lazy_items = dict(LAZY)
+    return {
+        "total_seconds": round(_ready.get("total", 0.0), 4),
+        "phases": {name: round(seconds, 4) for name, seconds in PHASES.items()},
+        "lazy": {name: round(seconds, 4) for name, seconds in lazy_items.items()},
+    }
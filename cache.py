@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# Caché de lecturas por entidad (detalle de personaje, equipo e identidad).
+# Es por proceso; cada entrada lleva la huella de data_versions con la que se
+# cargó (ver crud._cached), así que las escrituras de otros workers la invalidan.
+entities = LRUCache(
+    maxsize=int(os.getenv("ENTITY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ENTITY_CACHE_TTL", "60")),
+)
+
+def character_keys(ids: Iterable[int]) -> list:
+    return [("character", i) for i in ids if i is not None]
+
+def team_keys(ids: Iterable[int]) -> list:
+    return [("team", i) for i in ids if i is not None]
+
+def identity_keys(ids: Iterable[int]) -> list:
+    return [("identity", i) for i in ids if i is not None]
+
+# Fragmentos HTML de las páginas del frontend. La clave incluye la huella de
+# versiones de datos, así que una escritura los deja obsoletos sin invalidar nada.
+fragments = LRUCache(
+    maxsize=int(os.getenv("FRAGMENT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FRAGMENT_CACHE_TTL", "300")),
+)
@@ -1,21 +1,120 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 import models, schemas
+import search
+import cache
+import versions
+import stats
 from typing import List, Optional
 from datetime import date
 
-def get_characters(db: Session, q: str = "", skip: int = 0, limit: int = 100) -> List[models.Character]:
-    query = db.query(models.Character).filter(models.Character.active == True)
+# Relaciones que necesita cada forma de respuesta, cargadas con IN en lotes
+CHARACTER_LIST_OPTIONS = (
+    selectinload(models.Character.image),
+    selectinload(models.Character.secret_identity),
+    selectinload(models.Character.teams).joinedload(models.CharacterTeam.team).selectinload(models.Team.image),
+)
+TEAM_LIST_OPTIONS = (
+    selectinload(models.Team.image),
+)
+TEAM_MEMBERS_OPTIONS = (
+    selectinload(models.Team.members).joinedload(models.CharacterTeam.character),
+)
+IDENTITY_CHARACTER_OPTIONS = (
+    selectinload(models.SecretIdentity.character),
+)
+CHARACTER_TEAM_LIST_OPTIONS = (
+    selectinload(models.CharacterTeam.character).options(*CHARACTER_LIST_OPTIONS),
+    selectinload(models.CharacterTeam.team).options(*TEAM_LIST_OPTIONS),
+)
+# Columnas que devuelven las escrituras (RETURNING): la fila sin relaciones
+CHARACTER_ROW_COLUMNS = tuple(getattr(models.Character, name) for name in schemas.CharacterRow.model_fields)
+TEAM_ROW_COLUMNS = tuple(getattr(models.Team, name) for name in schemas.TeamRow.model_fields)
+
+def _paginate(query, column, skip: int = 0, limit: Optional[int] = None, after_id: Optional[int] = None):
+    # Keyset: con after_id se filtra por id en lugar de saltar filas con OFFSET
+    if after_id is not None:
+        query = query.filter(column > after_id)
+    query = query.order_by(column)
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def list_rows(db: Session, model, columns, q: str = "", skip: int = 0, limit: Optional[int] = None,
+              after_id: Optional[int] = None, image: bool = False) -> list:
+    # Mismo filtro y orden que get_characters, get_teams, get_identities y
+    # get_character_teams, pero devuelve tuplas con las columnas pedidas (ver listings)
+    query = db.query(model)
+    if hasattr(model, "active"):
+        query = query.filter(model.active == True)
+    if q:
+        query = search.apply(query, model, q, ranked=after_id is None)
+    if image:
+        query = query.outerjoin(models.ImageAsset, models.ImageAsset.original_url == model.image_url)
+    return _paginate(query, model.id, skip, limit, after_id).with_entities(*columns).all()
+
+def get_characters(db: Session, q: str = "", skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Character]:
+    query = db.query(models.Character).options(*CHARACTER_LIST_OPTIONS).filter(models.Character.active == True)
     if q:
-        qlike = f"%{q.lower()}%"
-        query = query.filter(models.Character.name.ilike(qlike) | models.Character.alias.ilike(qlike))
-    return query.order_by(models.Character.id).offset(skip).limit(limit).all()
+        # En modo cursor se conserva el orden por id para que el keyset sea estable
+        query = search.apply(query, models.Character, q, ranked=after_id is None)
+    return _paginate(query, models.Character.id, skip, limit, after_id).all()
 
 def get_character(db: Session, character_id: int) -> Optional[models.Character]:
     return db.query(models.Character).options(
+        joinedload(models.Character.image),
         joinedload(models.Character.secret_identity),
-        joinedload(models.Character.teams).joinedload(models.CharacterTeam.team)
+        joinedload(models.Character.teams).joinedload(models.CharacterTeam.team).joinedload(models.Team.image)
     ).filter(models.Character.id == character_id).first()
 
+def _cached(db: Session, key, tables, state: Optional[dict], load, schema):
+    # Cada entrada guarda la huella de versiones leída antes de cargarla. Si
+    # otra sesión u otro proceso escribió después, la huella no coincide y se
+    # recarga: el cuerpo nunca queda más viejo que el ETag de la respuesta.
+    # state: las versiones ya leídas para el ETag (evita otra consulta)
+    if state is None:
+        state = versions.current(db, tables)
+    stamp = versions.fingerprint({t: state[t] for t in tables if t in state})
+    entry = cache.entities.get(key)
+    if entry is not cache.MISSING and entry[0] == stamp:
+        return entry[1]
+    obj = load()
+    value = schema.model_validate(obj, from_attributes=True) if obj is not None else None
+    cache.entities.set(key, (stamp, value))
+    return value
+
+def get_character_cached(db: Session, character_id: int, state: Optional[dict] = None) -> Optional[schemas.Character]:
+    return _cached(db, ("character", character_id), versions.CHARACTER_TABLES, state,
+                   lambda: get_character(db, character_id), schemas.Character)
+
+def _team_member_ids(db: Session, *team_ids: int) -> List[int]:
+    rows = db.query(models.CharacterTeam.character_id).filter(models.CharacterTeam.team_id.in_(team_ids)).distinct().all()
+    return [r[0] for r in rows]
+
+def _update_row(db: Session, model, object_id: int, changes: dict, columns) -> Optional[dict]:
+    # Un solo UPDATE ... RETURNING: sin cargar la fila ni sus relaciones antes,
+    # sin refresh después. Sin cambios solo se lee la fila.
+    if changes:
+        stmt = update(model).where(model.id == object_id).values(**changes).returning(*columns)
+    else:
+        stmt = select(*columns).where(model.id == object_id)
+    row = db.execute(stmt).first()
+    if row is None:
+        db.rollback()
+        return None
+    return dict(row._mapping)
+
+def _set_active(db: Session, model, ids: List[int], active: bool) -> List[int]:
+    # Borrado lógico o restauración de varios ids en una sentencia; devuelve los que existen
+    stmt = update(model).where(model.id.in_(ids)).values(active=active).returning(model.id)
+    found = sorted(r[0] for r in db.execute(stmt))
+    if not found:
+        db.rollback()
+    return found
+
 def create_character(db: Session, character: schemas.CharacterCreate, image_filename: str = None, image_url: str = None) -> models.Character:
     db_character = models.Character(**character.dict())
     if image_filename:
@@ -23,44 +122,58 @@ def create_character(db: Session, character: schemas.CharacterCreate, image_file
     if image_url:
         db_character.image_url = image_url
     db.add(db_character)
+    versions.bump(db, versions.CHARACTERS)
     db.commit()
     db.refresh(db_character)
+    cache.entities.invalidate(*cache.character_keys([db_character.id]))
     return db_character
 
-def update_character(db: Session, character_id: int, character: schemas.CharacterCreate) -> Optional[models.Character]:
-    db_character = get_character(db, character_id)
-    if db_character:
-        for key, value in character.dict().items():
-            setattr(db_character, key, value)
+def update_character(db: Session, character_id: int, changes: dict) -> Optional[dict]:
+    row = _update_row(db, models.Character, character_id, changes, CHARACTER_ROW_COLUMNS)
+    if row is not None and changes:
+        versions.bump(db, versions.CHARACTERS)
         db.commit()
-        db.refresh(db_character)
-    return db_character
+        cache.entities.invalidate(*cache.character_keys([character_id]))
+    return row
 
-def soft_delete_character(db: Session, character_id: int) -> Optional[models.Character]:
-    db_character = db.query(models.Character).filter(models.Character.id == character_id).first()
-    if db_character:
-        db_character.active = False
+def set_characters_active(db: Session, character_ids: List[int], active: bool) -> List[int]:
+    found = _set_active(db, models.Character, character_ids, active)
+    if found:
+        versions.bump(db, versions.CHARACTERS)
         db.commit()
-        db.refresh(db_character)
-    return db_character
+        cache.entities.invalidate(*cache.character_keys(found))
+    return found
 
-def restore_character(db: Session, character_id: int) -> Optional[models.Character]:
-    db_character = db.query(models.Character).filter(models.Character.id == character_id).first()
-    if db_character:
-        db_character.active = True
-        db.commit()
-        db.refresh(db_character)
-    return db_character
+def soft_delete_character(db: Session, character_id: int) -> bool:
+    return bool(set_characters_active(db, [character_id], False))
+
+def restore_character(db: Session, character_id: int) -> bool:
+    return bool(set_characters_active(db, [character_id], True))
+
+def set_character_image(db: Session, character_id: int, image_url: str):
+    db.query(models.Character).filter(models.Character.id == character_id).update({"image_url": image_url})
+    versions.bump(db, versions.CHARACTERS)
+    db.commit()
+    cache.entities.invalidate(*cache.character_keys([character_id]))
 
-def get_teams(db: Session, q: str = "", skip: int = 0, limit: int = 100) -> List[models.Team]:
-    query = db.query(models.Team).filter(models.Team.active == True)
+def get_teams(db: Session, q: str = "", skip: int = 0, limit: int = 100, with_members: bool = False, after_id: Optional[int] = None) -> List[models.Team]:
+    query = db.query(models.Team).options(*TEAM_LIST_OPTIONS).filter(models.Team.active == True)
+    if with_members:
+        query = query.options(*TEAM_MEMBERS_OPTIONS)
     if q:
-        qlike = f"%{q.lower()}%"
-        query = query.filter(models.Team.name.ilike(qlike))
-    return query.order_by(models.Team.id).offset(skip).limit(limit).all()
+        query = search.apply(query, models.Team, q, ranked=after_id is None)
+    return _paginate(query, models.Team.id, skip, limit, after_id).all()
 
 def get_team(db: Session, team_id: int) -> Optional[models.Team]:
-    return db.query(models.Team).options(joinedload(models.Team.members).joinedload(models.CharacterTeam.character)).filter(models.Team.id == team_id).first()
+    return db.query(models.Team).options(joinedload(models.Team.image), joinedload(models.Team.members).joinedload(models.CharacterTeam.character)).filter(models.Team.id == team_id).first()
+
+def get_team_cached(db: Session, team_id: int, state: Optional[dict] = None) -> Optional[schemas.Team]:
+    return _cached(db, ("team", team_id), versions.TEAM_TABLES, state, lambda: get_team(db, team_id), schemas.Team)
+
+def _invalidate_teams(db: Session, team_ids: List[int]):
+    # El detalle de cada miembro embebe el equipo
+    keys = cache.team_keys(team_ids) + cache.character_keys(_team_member_ids(db, *team_ids))
+    cache.entities.invalidate(*keys)
 
 def create_team(db: Session, team: schemas.TeamCreate, image_filename: str = None, image_url: str = None) -> models.Team:
     db_team = models.Team(**team.dict())
@@ -69,41 +182,53 @@ def create_team(db: Session, team: schemas.TeamCreate, image_filename: str = Non
     if image_url:
         db_team.image_url = image_url
     db.add(db_team)
+    versions.bump(db, versions.TEAMS)
     db.commit()
     db.refresh(db_team)
+    cache.entities.invalidate(*cache.team_keys([db_team.id]))
     return db_team
 
-def update_team(db: Session, team_id: int, team: schemas.TeamCreate) -> Optional[models.Team]:
-    db_team = get_team(db, team_id)
-    if db_team:
-        for key, value in team.dict().items():
-            setattr(db_team, key, value)
+def update_team(db: Session, team_id: int, changes: dict) -> Optional[dict]:
+    row = _update_row(db, models.Team, team_id, changes, TEAM_ROW_COLUMNS)
+    if row is not None and changes:
+        versions.bump(db, versions.TEAMS)
         db.commit()
-        db.refresh(db_team)
-    return db_team
+        _invalidate_teams(db, [team_id])
+    return row
 
-def soft_delete_team(db: Session, team_id: int) -> Optional[models.Team]:
-    db_team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    if db_team:
-        db_team.active = False
+def set_teams_active(db: Session, team_ids: List[int], active: bool) -> List[int]:
+    found = _set_active(db, models.Team, team_ids, active)
+    if found:
+        versions.bump(db, versions.TEAMS)
         db.commit()
-        db.refresh(db_team)
-    return db_team
+        _invalidate_teams(db, found)
+    return found
 
-def restore_team(db: Session, team_id: int) -> Optional[models.Team]:
-    db_team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    if db_team:
-        db_team.active = True
-        db.commit()
-        db.refresh(db_team)
-    return db_team
+def soft_delete_team(db: Session, team_id: int) -> bool:
+    return bool(set_teams_active(db, [team_id], False))
 
-def get_identities(db: Session) -> List[models.SecretIdentity]:
-    return db.query(models.SecretIdentity).all()
+def restore_team(db: Session, team_id: int) -> bool:
+    return bool(set_teams_active(db, [team_id], True))
+
+def set_team_image(db: Session, team_id: int, image_url: str):
+    db.query(models.Team).filter(models.Team.id == team_id).update({"image_url": image_url})
+    versions.bump(db, versions.TEAMS)
+    db.commit()
+    _invalidate_teams(db, [team_id])
+
+def get_identities(db: Session, skip: int = 0, limit: Optional[int] = None, with_character: bool = False, after_id: Optional[int] = None) -> List[models.SecretIdentity]:
+    query = db.query(models.SecretIdentity)
+    if with_character:
+        query = query.options(*IDENTITY_CHARACTER_OPTIONS)
+    return _paginate(query, models.SecretIdentity.id, skip, limit, after_id).all()
 
 def get_identity(db: Session, identity_id: int) -> Optional[models.SecretIdentity]:
     return db.query(models.SecretIdentity).filter(models.SecretIdentity.id == identity_id).first()
 
+def get_identity_cached(db: Session, identity_id: int, state: Optional[dict] = None) -> Optional[schemas.SecretIdentity]:
+    return _cached(db, ("identity", identity_id), versions.IDENTITY_TABLES, state,
+                   lambda: get_identity(db, identity_id), schemas.SecretIdentity)
+
 def create_identity(db: Session, identity: schemas.SecretIdentityCreate) -> models.SecretIdentity:
     character = db.query(models.Character).filter(models.Character.id == identity.character_id).first()
     if not character:
@@ -113,13 +238,16 @@ def create_identity(db: Session, identity: schemas.SecretIdentityCreate) -> mode
         raise ValueError("Character already has a SecretIdentity")
     db_identity = models.SecretIdentity(**identity.dict())
     db.add(db_identity)
+    versions.bump(db, versions.IDENTITIES)
     db.commit()
     db.refresh(db_identity)
+    cache.entities.invalidate(*cache.identity_keys([db_identity.id]), *cache.character_keys([identity.character_id]))
     return db_identity
 
 def update_identity(db: Session, identity_id: int, identity: schemas.SecretIdentityCreate) -> Optional[models.SecretIdentity]:
     db_identity = get_identity(db, identity_id)
     if db_identity:
+        old_char_id = db_identity.character_id
         new_char_id = identity.character_id
         if new_char_id != db_identity.character_id:
             new_char = db.query(models.Character).filter(models.Character.id == new_char_id).first()
@@ -130,41 +258,99 @@ def update_identity(db: Session, identity_id: int, identity: schemas.SecretIdent
                 raise ValueError("New Character already has a SecretIdentity")
         for key, value in identity.dict().items():
             setattr(db_identity, key, value)
+        versions.bump(db, versions.IDENTITIES)
         db.commit()
         db.refresh(db_identity)
+        cache.entities.invalidate(*cache.identity_keys([identity_id]), *cache.character_keys([old_char_id, new_char_id]))
     return db_identity
 
 def delete_identity(db: Session, identity_id: int):
     db_identity = get_identity(db, identity_id)
     if db_identity:
+        character_id = db_identity.character_id
         db.delete(db_identity)
+        versions.bump(db, versions.IDENTITIES)
         db.commit()
+        cache.entities.invalidate(*cache.identity_keys([identity_id]), *cache.character_keys([character_id]))
 
-def get_character_teams(db: Session) -> List[models.CharacterTeam]:
-    return db.query(models.CharacterTeam).all()
+def get_character_teams(db: Session, skip: int = 0, limit: Optional[int] = None, after_id: Optional[int] = None) -> List[models.CharacterTeam]:
+    query = db.query(models.CharacterTeam).options(*CHARACTER_TEAM_LIST_OPTIONS)
+    return _paginate(query, models.CharacterTeam.id, skip, limit, after_id).all()
+
+def _violation(e: IntegrityError) -> str:
+    # "unique", "foreign_key" u "other". SQLSTATE en PostgreSQL (23505, 23503);
+    # SQLite solo lo dice en el mensaje
+    code = getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)
+    message = str(e.orig)
+    if code == "23505" or "UNIQUE constraint failed" in message:
+        return "unique"
+    if code == "23503" or "FOREIGN KEY constraint failed" in message:
+        return "foreign_key"
+    return "other"
 
 def create_character_team(db: Session, ct: schemas.CharacterTeamCreate) -> models.CharacterTeam:
     character = db.query(models.Character).filter(models.Character.id == ct.character_id).first()
     team = db.query(models.Team).filter(models.Team.id == ct.team_id).first()
     if not character or not team:
         raise ValueError("Character or Team not found")
-    exist = db.query(models.CharacterTeam).filter(models.CharacterTeam.character_id==ct.character_id, models.CharacterTeam.team_id==ct.team_id).first()
-    if exist:
-        raise ValueError("Relation already exists")
+    # El índice único (character_id, team_id) resuelve los duplicados sin carrera
     db_ct = models.CharacterTeam(**ct.dict())
     db.add(db_ct)
-    db.commit()
+    versions.bump(db, versions.CHARACTER_TEAM)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        kind = _violation(e)
+        if kind == "unique":
+            raise ValueError("Relation already exists")
+        if kind == "foreign_key":
+            # El personaje o el equipo se borró entre la consulta y el commit
+            raise ValueError("Character or Team not found")
+        raise
     db.refresh(db_ct)
+    cache.entities.invalidate(*cache.character_keys([ct.character_id]), *cache.team_keys([ct.team_id]))
     return db_ct
 
+def set_team_members(db: Session, team_id: int, members: schemas.TeamMembersUpdate) -> Optional[dict]:
+    if db.query(models.Team.id).filter(models.Team.id == team_id).first() is None:
+        return None
+    current = set(_team_member_ids(db, team_id))
+    target = set(members.character_ids) if members.character_ids is not None else set(current)
+    target = (target | set(members.add)) - set(members.remove)
+    to_add = sorted(target - current)
+    to_remove = sorted(current - target)
+
+    if to_add:
+        found = {r[0] for r in db.query(models.Character.id).filter(models.Character.id.in_(to_add)).all()}
+        missing = [i for i in to_add if i not in found]
+        if missing:
+            raise ValueError(f"Characters not found: {missing}")
+    if to_remove:
+        db.execute(delete(models.CharacterTeam).where(
+            models.CharacterTeam.team_id == team_id,
+            models.CharacterTeam.character_id.in_(to_remove),
+        ))
+    if to_add:
+        db.execute(insert(models.CharacterTeam), [{"character_id": i, "team_id": team_id} for i in to_add])
+    if to_add or to_remove:
+        versions.bump(db, versions.CHARACTER_TEAM)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("Team roster changed concurrently, retry")
+        cache.entities.invalidate(*cache.team_keys([team_id]), *cache.character_keys(to_add + to_remove))
+    return {"team_id": team_id, "character_ids": sorted(target), "added": to_add, "removed": to_remove}
+
 def delete_character_team(db: Session, ct_id: int):
     db_ct = db.query(models.CharacterTeam).filter(models.CharacterTeam.id == ct_id).first()
     if db_ct:
+        character_id, team_id = db_ct.character_id, db_ct.team_id
         db.delete(db_ct)
+        versions.bump(db, versions.CHARACTER_TEAM)
         db.commit()
+        cache.entities.invalidate(*cache.character_keys([character_id]), *cache.team_keys([team_id]))
 
 def get_stats(db: Session):
-    chars = db.query(models.Character).count()
-    teams = db.query(models.Team).count()
-    identities = db.query(models.SecretIdentity).count()
-    return {"characters": chars, "teams": teams, "identities": identities}
\ No newline at end of file
+    return stats.get(db)
\ No newline at end of file
@@ -0,0 +1,118 @@
+from typing import List, Optional, Union
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import crud, schemas
+import listings
+import versions
+
+# Variantes awaitables de crud. Con una AsyncSession la consulta corre en
+# run_sync (I/O asíncrono del driver); con una Session síncrona se manda al
+# threadpool. En ambos casos el event loop nunca queda bloqueado.
+AnySession = Union[AsyncSession, Session]
+
+async def run(db: AnySession, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+def _serialized(fn, schema):
+    # Se serializa dentro de la sesión: fuera de run_sync no hay lazy loads
+    def call(session, *args, **kwargs):
+        result = fn(session, *args, **kwargs)
+        if result is None or schema is None or isinstance(result, schema):
+            return result
+        if isinstance(result, list):
+            return [schema.model_validate(r, from_attributes=True) for r in result]
+        return schema.model_validate(result, from_attributes=True)
+    return call
+
+async def data_versions(db: AnySession, tables) -> dict:
+    return await run(db, versions.current, tables)
+
+async def conditional_get(request: Request, response: Response, db: AnySession, tables, state: Optional[dict] = None) -> Optional[Response]:
+    return await run(db, lambda s: versions.conditional_get(request, response, s, tables, state=state))
+
+async def get_characters(db: AnySession, selection=None, **kwargs) -> List[dict]:
+    # Listados: dicts armados desde tuplas (listings), sin pasar por pydantic
+    return await run(db, listings.characters, selection, **kwargs)
+
+async def get_character_cached(db: AnySession, character_id: int, state: Optional[dict] = None) -> Optional[schemas.Character]:
+    return await run(db, crud.get_character_cached, character_id, state)
+
+async def create_character(db: AnySession, character: schemas.CharacterCreate, **kwargs) -> schemas.Character:
+    return await run(db, _serialized(crud.create_character, schemas.Character), character, **kwargs)
+
+async def update_character(db: AnySession, character_id: int, changes: dict) -> Optional[dict]:
+    # Escrituras: un UPDATE ... RETURNING, la fila sale tal cual de la base
+    return await run(db, crud.update_character, character_id, changes)
+
+async def set_characters_active(db: AnySession, character_ids: List[int], active: bool) -> List[int]:
+    return await run(db, crud.set_characters_active, character_ids, active)
+
+async def soft_delete_character(db: AnySession, character_id: int) -> bool:
+    return await run(db, crud.soft_delete_character, character_id)
+
+async def restore_character(db: AnySession, character_id: int) -> bool:
+    return await run(db, crud.restore_character, character_id)
+
+async def get_teams(db: AnySession, selection=None, **kwargs) -> List[dict]:
+    return await run(db, listings.teams, selection, **kwargs)
+
+async def get_team_members(db: AnySession, team_id: int) -> List[dict]:
+    members = await run(db, listings.team_members, [team_id])
+    return members.get(team_id, [])
+
+async def get_team_cached(db: AnySession, team_id: int, state: Optional[dict] = None) -> Optional[schemas.Team]:
+    return await run(db, crud.get_team_cached, team_id, state)
+
+async def create_team(db: AnySession, team: schemas.TeamCreate, **kwargs) -> schemas.Team:
+    return await run(db, _serialized(crud.create_team, schemas.Team), team, **kwargs)
+
+async def update_team(db: AnySession, team_id: int, changes: dict) -> Optional[dict]:
+    return await run(db, crud.update_team, team_id, changes)
+
+async def set_teams_active(db: AnySession, team_ids: List[int], active: bool) -> List[int]:
+    return await run(db, crud.set_teams_active, team_ids, active)
+
+async def soft_delete_team(db: AnySession, team_id: int) -> bool:
+    return await run(db, crud.soft_delete_team, team_id)
+
+async def restore_team(db: AnySession, team_id: int) -> bool:
+    return await run(db, crud.restore_team, team_id)
+
+async def get_identities(db: AnySession, **kwargs) -> List[dict]:
+    return await run(db, listings.identities, **kwargs)
+
+async def get_identity(db: AnySession, identity_id: int) -> Optional[schemas.SecretIdentity]:
+    return await run(db, _serialized(crud.get_identity, schemas.SecretIdentity), identity_id)
+
+async def get_identity_cached(db: AnySession, identity_id: int, state: Optional[dict] = None) -> Optional[schemas.SecretIdentity]:
+    return await run(db, crud.get_identity_cached, identity_id, state)
+
+async def create_identity(db: AnySession, identity: schemas.SecretIdentityCreate) -> schemas.SecretIdentity:
+    return await run(db, _serialized(crud.create_identity, schemas.SecretIdentity), identity)
+
+async def update_identity(db: AnySession, identity_id: int, identity: schemas.SecretIdentityCreate) -> Optional[schemas.SecretIdentity]:
+    return await run(db, _serialized(crud.update_identity, schemas.SecretIdentity), identity_id, identity)
+
+async def delete_identity(db: AnySession, identity_id: int):
+    return await run(db, crud.delete_identity, identity_id)
+
+async def get_character_teams(db: AnySession, selection=None, **kwargs) -> List[dict]:
+    return await run(db, listings.character_teams, selection, **kwargs)
+
+async def create_character_team(db: AnySession, ct: schemas.CharacterTeamCreate) -> schemas.CharacterTeam:
+    return await run(db, _serialized(crud.create_character_team, schemas.CharacterTeam), ct)
+
+async def set_team_members(db: AnySession, team_id: int, members: schemas.TeamMembersUpdate) -> Optional[dict]:
+    return await run(db, crud.set_team_members, team_id, members)
+
+async def delete_character_team(db: AnySession, ct_id: int):
+    return await run(db, crud.delete_character_team, ct_id)
+
+async def get_stats(db: AnySession) -> dict:
+    return await run(db, crud.get_stats)
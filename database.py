@@ -1,8 +1,13 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 load_dotenv()
 
@@ -11,13 +16,175 @@ DATABASE_URL = os.getenv("DATABASE_URL") or os.getenv("POSTGRESQL_ADDON_URI")
 if not DATABASE_URL:
     raise Exception("ERROR: DATABASE_URL no se está leyendo del archivo .env")
 
-engine = create_engine(DATABASE_URL)
+# DB_ASYNC=1 hace que la API use el engine asíncrono (asyncpg / aiosqlite)
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+# Pool de conexiones: valores pensados para producción, ajustables por entorno
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "1")
+POOL_USE_LIFO = _env_bool("DB_POOL_LIFO", "1")
+
+class PoolWaitStats:
+    # Cuánto esperan las peticiones para obtener una conexión del pool
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if seconds >= 0.001:
+                self.waited += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+class _TimedPool:
+    # _do_get es donde QueuePool bloquea cuando no quedan conexiones libres
+    wait_stats: PoolWaitStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start, timed_out)
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+def pool_options(url: str, asynchronous: bool = False) -> dict:
+    options = {"pool_pre_ping": POOL_PRE_PING, "pool_recycle": POOL_RECYCLE}
+    parsed = make_url(url)
+    # SQLite en memoria usa un pool de una conexión por hilo: no admite tamaño
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_use_lifo=POOL_USE_LIFO,
+    )
+    return options
+
+def _with_wait_stats(engine):
+    engine.pool.wait_stats = PoolWaitStats()
+    return engine
+
+engine = _with_wait_stats(create_engine(DATABASE_URL, **pool_options(DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_database_url() -> str:
+    explicit = os.getenv("ASYNC_DATABASE_URL")
+    if explicit:
+        return explicit
+    url = make_url(DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if not driver:
+        raise Exception(f"ERROR: no hay driver asíncrono para {url.get_backend_name()}")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_sessionmaker():
+    # Se crea al primer uso para no exigir asyncpg/aiosqlite en modo síncrono
+    global _async_engine, _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+        url = get_async_database_url()
+        _async_engine = create_async_engine(url, **pool_options(url, asynchronous=True))
+        _async_engine.sync_engine.pool.wait_stats = PoolWaitStats()
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
+def pool_status(pool) -> dict:
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if hasattr(pool, "wait_stats"):
+        status["wait"] = pool.wait_stats.as_dict()
+    return status
+
+def pools_status() -> dict:
+    status = {"sync": pool_status(engine.pool)}
+    if _async_engine is not None:
+        status["async"] = pool_status(_async_engine.sync_engine.pool)
+    return status
+
+def ping() -> float:
+    # Ida y vuelta real a la base; devuelve la latencia en milisegundos
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 3)
+
+async def ping_async() -> float:
+    get_async_sessionmaker()
+    start = time.perf_counter()
+    async with _async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 3)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_db_session():
+    # Dependencia de la API: sesión asíncrona o síncrona según DB_ASYNC
+    if USE_ASYNC_DB:
+        async with get_async_sessionmaker()() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
@@ -0,0 +1,74 @@
+import csv
+import io
+import os
+import zlib
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+import fastjson
+import models
+
+CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+# Columnas planas por entidad: se leen como tuplas, sin instanciar el ORM
+COLUMNS = {
+    "characters": (models.Character, ("id", "name", "alias", "alignment", "first_appearance", "description", "image_url", "active", "created_at")),
+    "teams": (models.Team, ("id", "name", "founded_date", "description", "image_url", "active", "created_at")),
+    "identities": (models.SecretIdentity, ("id", "character_id", "real_name", "birth_date", "place_of_birth")),
+    "character_team": (models.CharacterTeam, ("id", "character_id", "team_id")),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _statement(entity: str, active: Optional[bool], since: Optional[datetime]):
+    model, names = COLUMNS[entity]
+    stmt = select(*[getattr(model, n) for n in names]).order_by(model.id)
+    if active is not None and hasattr(model, "active"):
+        stmt = stmt.where(model.active == active)
+    if since is not None and hasattr(model, "created_at"):
+        stmt = stmt.where(model.created_at >= since)
+    # yield_per activa stream_results: cursor del lado del servidor en PostgreSQL
+    return stmt.execution_options(yield_per=CHUNK_ROWS)
+
+def _encode(names, rows, fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for partition in rows.partitions():
+            for row in partition:
+                writer.writerow(["" if v is None else v.isoformat() if isinstance(v, (date, datetime)) else v for v in row])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    else:
+        for partition in rows.partitions():
+            yield b"".join(fastjson.dumps(dict(zip(names, row))) + b"\n" for row in partition)
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(entity: str, fmt: str = "ndjson", active: Optional[bool] = None,
+                  since: Optional[datetime] = None, compress: bool = False) -> Iterator[bytes]:
+    # Abre su propia sesión: el generador vive más que la petición que lo creó
+    from database import SessionLocal
+
+    def generate():
+        db = SessionLocal()
+        try:
+            _, names = COLUMNS[entity]
+            rows = db.execute(_statement(entity, active, since))
+            yield from _encode(names, rows, fmt)
+        finally:
+            db.close()
+
+    return _gzip(generate()) if compress else generate()
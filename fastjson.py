@@ -0,0 +1,33 @@
+import json
+from datetime import date, datetime
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+# orjson es opcional: si no está instalado se usa json con el mismo formato
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    # Solo tipos que salen de la base: str, int, bool, None, fechas, listas y dicts
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def respond(response: Response, content) -> FastJSONResponse:
+    # Se devuelve la respuesta tal cual, sin pasar por el response_model: los
+    # datos vienen de la base y ya tienen la forma final. Las cabeceras fijadas
+    # en la respuesta inyectada (ETag, Cache-Control) se conservan.
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return FastJSONResponse(content, status_code=response.status_code or 200, headers=headers)
@@ -0,0 +1,65 @@
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+import schemas
+
+# ?fields=id,name,alias&expand=identity,teams
+# Sin ninguno de los dos parámetros la respuesta es la completa de siempre.
+# Con ?fields= y sin ?expand= no se carga ni se emite ninguna relación.
+# Las filas se arman en listings.
+
+class Entity(NamedTuple):
+    fields: Tuple[str, ...]          # campos escalares, en el orden del esquema
+    relations: Dict[str, str]        # nombre en ?expand= -> clave en la respuesta
+    default_expand: FrozenSet[str]   # relaciones de la respuesta completa
+
+class Selection(NamedTuple):
+    fields: Tuple[str, ...]
+    expand: FrozenSet[str]
+
+def _scalars(schema, *relations: str) -> Tuple[str, ...]:
+    return tuple(name for name in schema.model_fields if name not in relations)
+
+CHARACTER_FIELDS = _scalars(schemas.Character, "secret_identity", "teams")
+TEAM_FIELDS = _scalars(schemas.Team)
+IDENTITY_FIELDS = _scalars(schemas.SecretIdentity)
+CHARACTER_TEAM_FIELDS = _scalars(schemas.CharacterTeam, "character", "team")
+# Forma de las entidades anidadas en una selección (?expand=)
+CHARACTER_SUMMARY_FIELDS = _scalars(schemas.CharacterSummary)
+TEAM_SUMMARY_FIELDS = _scalars(schemas.TeamSummary)
+
+CHARACTER = Entity(CHARACTER_FIELDS, {"identity": "secret_identity", "teams": "teams"}, frozenset({"identity", "teams"}))
+TEAM = Entity(TEAM_FIELDS, {"members": "members"}, frozenset())
+IDENTITY = Entity(IDENTITY_FIELDS, {}, frozenset())
+CHARACTER_TEAM = Entity(CHARACTER_TEAM_FIELDS, {"character": "character", "team": "team"}, frozenset({"character", "team"}))
+
+def full(entity: Entity) -> Selection:
+    return Selection(entity.fields, entity.default_expand)
+
+def _split(value: str):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def parse(entity: Entity, fields: Optional[str], expand: Optional[str]) -> Optional[Selection]:
+    if fields is None and expand is None:
+        return None
+    if fields is None:
+        selected = entity.fields
+    else:
+        requested = set(_split(fields))
+        unknown = sorted(requested - set(entity.fields))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+        # El id siempre va: lo necesitan el cursor y el cliente
+        selected = tuple(name for name in entity.fields if name in requested or name == "id")
+    expanded = frozenset(_split(expand or ""))
+    unknown = sorted(expanded - set(entity.relations))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand: {unknown}; allowed: {sorted(entity.relations)}")
+    return Selection(selected, expanded)
+
+def dump_schema(entity: Entity, obj: BaseModel, selection: Selection) -> dict:
+    # Para objetos ya serializados (caché de entidades)
+    include = set(selection.fields) | {entity.relations[name] for name in selection.expand}
+    return obj.model_dump(include=include)
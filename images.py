@@ -0,0 +1,130 @@
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+import models
+import storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "256"))
+WEB_MAX_SIZE = int(os.getenv("IMAGE_WEB_MAX_SIZE", "1280"))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+# Variante -> lado máximo en píxeles
+VARIANTS = {"web": WEB_MAX_SIZE, "thumb": THUMBNAIL_SIZE}
+
+@dataclass
+class ProcessedImage:
+    content_hash: str
+    extension: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    variants: Dict[str, str] = field(default_factory=dict)
+
+def object_key(content_hash: str, variant: str, extension: str) -> str:
+    # Clave direccionada por contenido: la misma imagen siempre cae en el mismo objeto
+    return f"images/{content_hash[:2]}/{content_hash}_{variant}{extension}"
+
+def process(staged: storage.StagedUpload) -> ProcessedImage:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    extension = os.path.splitext(staged.filename)[1].lower() or mimetypes.guess_extension(staged.content_type) or ""
+    result = ProcessedImage(content_hash=staged.content_hash, extension=extension)
+    try:
+        with Image.open(staged.path) as img:
+            img = ImageOps.exif_transpose(img)
+            result.width, result.height = img.size
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            for name, max_side in VARIANTS.items():
+                variant = img.copy()
+                variant.thumbnail((max_side, max_side))
+                fd, path = tempfile.mkstemp(prefix=f"{name}_", suffix=".webp")
+                with os.fdopen(fd, "wb") as out:
+                    variant.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+                result.variants[name] = path
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        # Si no se puede decodificar se guarda solo el original
+        logger.warning("No se pudieron generar variantes de %s: %s", staged.filename, e)
+        cleanup(result)
+    return result
+
+def cleanup(result: ProcessedImage):
+    for path in result.variants.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    result.variants = {}
+
+def _existing_asset(db, content_hash: str) -> Optional[models.ImageAsset]:
+    return db.query(models.ImageAsset).filter(models.ImageAsset.content_hash == content_hash).first()
+
+def store(staged: storage.StagedUpload) -> Optional[str]:
+    from database import SessionLocal
+
+    backend = storage.get_storage()
+    db = SessionLocal()
+    try:
+        content_hash = staged.content_hash
+        asset = _existing_asset(db, content_hash)
+        if asset:
+            return asset.original_url
+
+        processed = process(staged)
+        try:
+            original_url = backend.upload(staged.path, object_key(content_hash, "original", processed.extension), staged.content_type)
+            if not original_url:
+                return None
+            urls = {
+                name: backend.upload(path, object_key(content_hash, name, ".webp"), "image/webp")
+                for name, path in processed.variants.items()
+            }
+        finally:
+            cleanup(processed)
+
+        asset = models.ImageAsset(
+            content_hash=content_hash,
+            content_type=staged.content_type,
+            original_url=original_url,
+            web_url=urls.get("web"),
+            thumbnail_url=urls.get("thumb"),
+            width=processed.width,
+            height=processed.height,
+        )
+        db.add(asset)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra subida del mismo contenido ganó la carrera
+            db.rollback()
+            asset = _existing_asset(db, content_hash)
+            return asset.original_url if asset else original_url
+        return original_url
+    finally:
+        db.close()
+
+def _job(staged: storage.StagedUpload, on_done: Callable[[str], None]) -> Optional[str]:
+    start = time.perf_counter()
+    try:
+        url = store(staged)
+    except Exception:
+        logger.exception("Error procesando la imagen %s", staged.filename)
+        url = None
+    finally:
+        storage.discard(staged)
+        metrics.IMAGE_STORE_SECONDS.observe(time.perf_counter() - start)
+    if url:
+        on_done(url)
+    return url
+
+def enqueue(staged: storage.StagedUpload, on_done: Callable[[str], None]):
+    return storage.submit(_job, staged, on_done)
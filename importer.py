@@ -0,0 +1,266 @@
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import cache
+import models, schemas
+import versions
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 1000
+
+ENTITIES = {
+    "characters": (models.Character, schemas.CharacterCreate),
+    "teams": (models.Team, schemas.TeamCreate),
+    "identities": (models.SecretIdentity, schemas.SecretIdentityCreate),
+    "character_team": (models.CharacterTeam, schemas.CharacterTeamCreate),
+}
+
+# Columnas que se aceptan además de las del schema de creación
+EXTRA_COLUMNS = {
+    "characters": ("id", "image_url"),
+    "teams": ("id", "image_url"),
+    "identities": (),
+    "character_team": (),
+}
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").endswith("ndjson"):
+        return "ndjson"
+    return "csv"
+
+def read_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Dict]:
+    if fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                # Una línea inválida es un error de esa fila, no de todo el archivo
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield e
+    else:
+        for row in csv.DictReader(stream):
+            # En CSV una celda vacía significa "sin valor"
+            yield {k: (v if v != "" else None) for k, v in row.items() if k}
+
+def _validate(entity: str, raw: Dict) -> Dict:
+    model, schema = ENTITIES[entity]
+    data = schema(**{k: v for k, v in raw.items() if v is not None and k in schema.model_fields}).dict()
+    for column in EXTRA_COLUMNS[entity]:
+        if raw.get(column) is not None:
+            data[column] = int(raw[column]) if column == "id" else raw[column]
+    # Los defaults de Python no existen en la base: se completan aquí para COPY
+    if hasattr(model, "created_at"):
+        data.setdefault("created_at", datetime.utcnow())
+    return data
+
+def _existing_ids(db: Session, model, ids: Iterable[int]) -> set:
+    ids = set(ids)
+    if not ids:
+        return set()
+    return {r[0] for r in db.query(model.id).filter(model.id.in_(ids)).all()}
+
+def _check_identities(db: Session, batch: List[Tuple[int, Dict]]):
+    character_ids = {d["character_id"] for _, d in batch}
+    found = _existing_ids(db, models.Character, character_ids)
+    taken = {
+        r[0] for r in db.query(models.SecretIdentity.character_id)
+        .filter(models.SecretIdentity.character_id.in_(character_ids)).all()
+    }
+    for line, data in batch:
+        if data["character_id"] not in found:
+            yield line, data, "Character not found"
+        elif data["character_id"] in taken:
+            yield line, data, "Character already has a SecretIdentity"
+        else:
+            taken.add(data["character_id"])
+            yield line, data, None
+
+def _check_relations(db: Session, batch: List[Tuple[int, Dict]]):
+    character_ids = {d["character_id"] for _, d in batch}
+    team_ids = {d["team_id"] for _, d in batch}
+    found_characters = _existing_ids(db, models.Character, character_ids)
+    found_teams = _existing_ids(db, models.Team, team_ids)
+    pairs = set(
+        db.query(models.CharacterTeam.character_id, models.CharacterTeam.team_id)
+        .filter(models.CharacterTeam.character_id.in_(character_ids), models.CharacterTeam.team_id.in_(team_ids))
+        .all()
+    )
+    for line, data in batch:
+        pair = (data["character_id"], data["team_id"])
+        if pair[0] not in found_characters or pair[1] not in found_teams:
+            yield line, data, "Character or Team not found"
+        elif pair in pairs:
+            yield line, data, "Relation already exists"
+        else:
+            pairs.add(pair)
+            yield line, data, None
+
+def _check_ids(db: Session, model, batch: List[Tuple[int, Dict]]):
+    taken = _existing_ids(db, model, [d["id"] for _, d in batch if "id" in d])
+    for line, data in batch:
+        if "id" in data and data["id"] in taken:
+            yield line, data, f"id {data['id']} already exists"
+        else:
+            if "id" in data:
+                taken.add(data["id"])
+            yield line, data, None
+
+CHECKS = {
+    "characters": lambda db, batch: _check_ids(db, models.Character, batch),
+    "teams": lambda db, batch: _check_ids(db, models.Team, batch),
+    "identities": _check_identities,
+    "character_team": _check_relations,
+}
+
+def _copy_rows(db: Session, table: str, rows: List[Dict]):
+    # Filas con distinto juego de columnas (p. ej. con y sin id) van en COPY separados
+    groups: Dict[Tuple[str, ...], List[Dict]] = {}
+    for r in rows:
+        groups.setdefault(tuple(sorted(r)), []).append(r)
+    for columns, group in groups.items():
+        _copy_group(db, table, columns, group)
+
+def _copy_group(db: Session, table: str, columns: Tuple[str, ...], rows: List[Dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in rows:
+        writer.writerow(["\\N" if r.get(c) is None else r[c] for c in columns])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+    finally:
+        cursor.close()
+
+def _insert(db: Session, model, rows: List[Dict]):
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copy_rows(db, model.__tablename__, rows)
+    else:
+        # executemany con insertmanyvalues: INSERT multi-fila por lotes
+        db.execute(insert(model), rows)
+
+def bulk_insert(db: Session, model, rows: List[Dict]):
+    # Primero las filas con id explícito y se adelanta la secuencia; recién
+    # después las que toman el id de la secuencia, que ya no pueden chocar
+    explicit = [r for r in rows if r.get("id") is not None]
+    implicit = [r for r in rows if r.get("id") is None]
+    if explicit:
+        _insert(db, model, explicit)
+        sync_sequence(db, model.__tablename__)
+    if implicit:
+        _insert(db, model, implicit)
+
+def sync_sequence(db: Session, table: str):
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+
+def import_rows(db: Session, entity: str, rows: Iterable[Dict], batch_size: int = BATCH_SIZE) -> Dict:
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity: {entity}")
+    model, _ = ENTITIES[entity]
+    summary = {"entity": entity, "processed": 0, "inserted": 0, "error_count": 0, "errors": []}
+
+    def error(line: int, message: str):
+        summary["error_count"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": line, "error": message})
+
+    def flush(batch: List[Tuple[int, Dict]]):
+        valid = []
+        for line, data, problem in CHECKS[entity](db, batch):
+            if problem:
+                error(line, problem)
+            else:
+                valid.append((line, data))
+        if not valid:
+            return
+        try:
+            bulk_insert(db, model, [data for _, data in valid])
+            versions.bump(db, model.__tablename__)
+            db.commit()
+            summary["inserted"] += len(valid)
+        except IntegrityError:
+            # P. ej. una escritura concurrente tomó el mismo id: se reintenta
+            # fila por fila para informar solo las que fallan
+            db.rollback()
+            for line, data in valid:
+                try:
+                    bulk_insert(db, model, [data])
+                    versions.bump(db, model.__tablename__)
+                    db.commit()
+                    summary["inserted"] += 1
+                except IntegrityError as e:
+                    db.rollback()
+                    error(line, str(e.orig))
+
+    batch: List[Tuple[int, Dict]] = []
+    for line, raw in enumerate(rows, start=1):
+        summary["processed"] += 1
+        if not isinstance(raw, dict):
+            error(line, f"Invalid row: {raw}")
+            continue
+        try:
+            batch.append((line, _validate(entity, raw)))
+        except ValidationError as e:
+            error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        except (ValueError, TypeError) as e:
+            error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    cache.entities.clear()
+    summary["errors"].sort(key=lambda e: e["row"])
+    return summary
+
+def import_file(db: Session, entity: str, binary_stream, fmt: str, batch_size: int = BATCH_SIZE) -> Dict:
+    stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        return import_rows(db, entity, read_rows(stream, fmt), batch_size=batch_size)
+    except (csv.Error, UnicodeDecodeError) as e:
+        db.rollback()
+        raise ValueError(f"Malformed input: {e}")
+    finally:
+        stream.detach()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva desde CSV o NDJSON")
+    parser.add_argument("entity", choices=sorted(ENTITIES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            result = import_file(db, args.entity, f, args.format or detect_format(args.path), batch_size=args.batch_size)
+    finally:
+        db.close()
+    errors = result.pop("errors")
+    print(json.dumps(result))
+    for e in errors:
+        print(f"Fila {e['row']}: {e['error']}")
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session, aliased
+
+import crud
+import fieldsets
+import models
+from fieldsets import Selection
+
+# Listados de la API armados desde tuplas: una consulta por tabla y por
+# relación pedida, sin instancias ORM ni validación pydantic. Los datos
+# vienen de la base y ya tienen la forma de los esquemas; el resultado va
+# directo a fastjson.
+
+IN_BATCH = 500
+
+def _chunks(ids: Sequence[int], size: int = IN_BATCH) -> Iterator[Sequence[int]]:
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _column(model, name: str, image):
+    # thumbnail_url es una propiedad del modelo: miniatura si hay ImageAsset, si no image_url
+    if name == "thumbnail_url":
+        return case((image.original_url.is_not(None), image.thumbnail_url), else_=model.image_url).label(name)
+    return getattr(model, name)
+
+def _columns(model, fields: Iterable[str], image=models.ImageAsset) -> list:
+    return [_column(model, name, image) for name in fields]
+
+def _rows_by_id(db: Session, model, fields: Sequence[str], ids: Sequence[int]) -> Dict[int, dict]:
+    # Sin filtrar por active: las relaciones apuntan también a entidades borradas
+    found = {}
+    for chunk in _chunks(ids):
+        stmt = (
+            select(*_columns(model, fields))
+            .outerjoin(models.ImageAsset, models.ImageAsset.original_url == model.image_url)
+            .where(model.id.in_(chunk))
+        )
+        for row in db.execute(stmt):
+            item = dict(zip(fields, row))
+            found[item["id"]] = item
+    return found
+
+def _identities(db: Session, character_ids: Sequence[int]) -> Dict[int, dict]:
+    fields = fieldsets.IDENTITY_FIELDS
+    found = {}
+    for chunk in _chunks(character_ids):
+        stmt = select(*_columns(models.SecretIdentity, fields)).where(models.SecretIdentity.character_id.in_(chunk))
+        for row in db.execute(stmt):
+            item = dict(zip(fields, row))
+            found[item["character_id"]] = item
+    return found
+
+def _memberships(db: Session, character_ids: Sequence[int]) -> Dict[int, List[dict]]:
+    # Forma de CharacterTeamMember: la relación con su equipo embebido
+    ct, team_fields = models.CharacterTeam, fieldsets.TEAM_FIELDS
+    image = aliased(models.ImageAsset)
+    found = defaultdict(list)
+    for chunk in _chunks(character_ids):
+        stmt = (
+            select(ct.character_id, ct.team_id, ct.id, *_columns(models.Team, team_fields, image))
+            .outerjoin(models.Team, models.Team.id == ct.team_id)
+            .outerjoin(image, image.original_url == models.Team.image_url)
+            .where(ct.character_id.in_(chunk))
+            .order_by(ct.id)
+        )
+        for row in db.execute(stmt):
+            team = dict(zip(team_fields, row[3:]))
+            found[row[0]].append({
+                "character_id": row[0], "team_id": row[1], "id": row[2],
+                "team": team if team["id"] is not None else None,
+            })
+    return found
+
+def team_members(db: Session, team_ids: Sequence[int]) -> Dict[int, List[dict]]:
+    ct, fields = models.CharacterTeam, fieldsets.CHARACTER_SUMMARY_FIELDS
+    found = defaultdict(list)
+    for chunk in _chunks(team_ids):
+        stmt = (
+            select(ct.team_id, *_columns(models.Character, fields))
+            .join(models.Character, models.Character.id == ct.character_id)
+            .outerjoin(models.ImageAsset, models.ImageAsset.original_url == models.Character.image_url)
+            .where(ct.team_id.in_(chunk))
+            .order_by(ct.id)
+        )
+        for row in db.execute(stmt):
+            found[row[0]].append(dict(zip(fields, row[1:])))
+    return found
+
+def _expand_characters(db: Session, items: List[dict], expand) -> List[dict]:
+    ids = [item["id"] for item in items]
+    if ids and "identity" in expand:
+        identities = _identities(db, ids)
+        for item in items:
+            item["secret_identity"] = identities.get(item["id"])
+    if ids and "teams" in expand:
+        memberships = _memberships(db, ids)
+        for item in items:
+            item["teams"] = memberships.get(item["id"], [])
+    return items
+
+def _listed(db: Session, model, fields: Sequence[str], **kwargs) -> List[dict]:
+    rows = crud.list_rows(db, model, _columns(model, fields), image="thumbnail_url" in fields, **kwargs)
+    return [dict(zip(fields, row)) for row in rows]
+
+def characters(db: Session, selection: Optional[Selection] = None, **kwargs) -> List[dict]:
+    selection = selection or fieldsets.full(fieldsets.CHARACTER)
+    items = _listed(db, models.Character, selection.fields, **kwargs)
+    return _expand_characters(db, items, selection.expand)
+
+def teams(db: Session, selection: Optional[Selection] = None, **kwargs) -> List[dict]:
+    selection = selection or fieldsets.full(fieldsets.TEAM)
+    items = _listed(db, models.Team, selection.fields, **kwargs)
+    if items and "members" in selection.expand:
+        members = team_members(db, [item["id"] for item in items])
+        for item in items:
+            item["members"] = members.get(item["id"], [])
+    return items
+
+def identities(db: Session, **kwargs) -> List[dict]:
+    return _listed(db, models.SecretIdentity, fieldsets.IDENTITY_FIELDS, **kwargs)
+
+def character_teams(db: Session, selection: Optional[Selection] = None, **kwargs) -> List[dict]:
+    # La respuesta completa embebe el personaje entero (con identidad y equipos)
+    # y el equipo; con ?expand= se embeben sus resúmenes
+    complete = selection is None
+    selection = selection or fieldsets.full(fieldsets.CHARACTER_TEAM)
+    # Las claves foráneas se leen siempre que haya que expandir
+    needed = set(selection.fields)
+    needed.update(f"{name}_id" for name in selection.expand)
+    fields = tuple(name for name in fieldsets.CHARACTER_TEAM_FIELDS if name in needed)
+    items = _listed(db, models.CharacterTeam, fields, **kwargs)
+    if not items:
+        return items
+    if "character" in selection.expand:
+        ids = sorted({item["character_id"] for item in items})
+        if complete:
+            found = _rows_by_id(db, models.Character, fieldsets.CHARACTER_FIELDS, ids)
+            _expand_characters(db, list(found.values()), fieldsets.CHARACTER.default_expand)
+        else:
+            found = _rows_by_id(db, models.Character, fieldsets.CHARACTER_SUMMARY_FIELDS, ids)
+        for item in items:
+            item["character"] = found.get(item["character_id"])
+    if "team" in selection.expand:
+        ids = sorted({item["team_id"] for item in items})
+        found = _rows_by_id(db, models.Team, fieldsets.TEAM_FIELDS if complete else fieldsets.TEAM_SUMMARY_FIELDS, ids)
+        for item in items:
+            item["team"] = found.get(item["team_id"])
+    extra = [name for name in fields if name not in selection.fields]
+    for item in items:
+        for name in extra:
+            del item[name]
+    return items
@@ -1,32 +1,82 @@
-import os
-from fastapi import FastAPI
-from fastapi.templating import Jinja2Templates
-from dotenv import load_dotenv
+import boot
 
-load_dotenv()
+with boot.phase("fastapi"):
+    import os
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from fastapi.staticfiles import StaticFiles
+    from starlette.concurrency import run_in_threadpool
 
-import models
-from database import engine
-from routers import characters, teams, identities, character_team, report
-from web_routes import pages
+with boot.phase("modules"):
+    # Primero database: carga .env antes de que los demás módulos lean el entorno
+    import database
+    from database import engine
+    import metrics
+    import migrations
+    import querycount
+    import search
+    import cache
+    import fastjson
+    import storage
+    import templating
 
-models.Base.metadata.create_all(bind=engine)
+with boot.phase("routers"):
+    from routers import characters, teams, identities, character_team, report, imports, export
+    from web_routes import pages
 
-app = FastAPI(title="Marvel API + Frontend HTML")
+metrics.install()
 
+@asynccontextmanager
+async def lifespan(app):
+    with boot.phase("schema"):
+        # El esquema lo crean las migraciones; aquí solo se verifica su versión
+        migrations.ensure(engine)
+        search.init(engine)
+    boot.ready()
+    yield
 
-templates = Jinja2Templates(directory="templates")
+with boot.phase("app"):
+    app = FastAPI(title="Marvel API + Frontend HTML", lifespan=lifespan, default_response_class=fastjson.FastJSONResponse)
+    app.add_middleware(metrics.MetricsMiddleware)
+    querycount.setup(app)
 
-app.state.templates = templates
+    app.state.templates = templating.LazyTemplates("templates")
 
-app.include_router(characters.router, prefix="/api")
-app.include_router(teams.router, prefix="/api")
-app.include_router(identities.router, prefix="/api")
-app.include_router(character_team.router, prefix="/api")
-app.include_router(report.router, prefix="/api")
+    if isinstance(storage.get_storage(), storage.LocalStorage):
+        os.makedirs(storage.MEDIA_ROOT, exist_ok=True)
+        app.mount(storage.MEDIA_URL.rstrip("/"), StaticFiles(directory=storage.MEDIA_ROOT), name="media")
 
-app.include_router(pages.router)
+    app.include_router(characters.router, prefix="/api")
+    app.include_router(teams.router, prefix="/api")
+    app.include_router(identities.router, prefix="/api")
+    app.include_router(character_team.router, prefix="/api")
+    app.include_router(report.router, prefix="/api")
+    app.include_router(imports.router, prefix="/api")
+    app.include_router(export.router, prefix="/api")
+
+    app.include_router(pages.router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok", "pool": database.pools_status(), "startup": boot.summary()}
+
+@app.get("/health/ready")
+async def health_ready():
+    # Readiness: a diferencia de /health, hace una consulta real a la base
+    try:
+        result = {"status": "ok", "db_latency_ms": await run_in_threadpool(database.ping)}
+        if database.USE_ASYNC_DB:
+            result["async_db_latency_ms"] = await database.ping_async()
+    except database.SQLAlchemyError as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(e.__class__.__name__)})
+    result["pool"] = database.pools_status()
+    return result
+
+@app.get("/health/cache")
+def health_cache():
+    return {"entities": cache.entities.stats(), "fragments": cache.fragments.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(database.pools_status(), boot.summary()), media_type="text/plain; version=0.0.4")
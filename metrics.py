@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+class Histogram:
+    # Histograma acumulativo al estilo Prometheus, con etiquetas fijas por serie
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for label_values, counts, total, count in sorted(items):
+            base = ",".join(f'{l}="{_escape(v)}"' for l, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}'
+            suffix = f"{{{base}}}" if base else ""
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {count}"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_SECONDS = Histogram("marvel_request_duration_seconds", "Latencia de la petición", ("method", "route", "status"), LATENCY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("marvel_request_db_seconds", "Tiempo en la base por petición", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_SQL = Histogram("marvel_request_sql_statements", "Sentencias SQL por petición", ("method", "route"), COUNT_BUCKETS)
+REQUEST_TEMPLATE_SECONDS = Histogram("marvel_request_template_seconds", "Tiempo de render de plantillas por petición", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_UPLOAD_SECONDS = Histogram("marvel_request_upload_seconds", "Tiempo recibiendo archivos subidos por petición", ("method", "route"), LATENCY_BUCKETS)
+IMAGE_STORE_SECONDS = Histogram("marvel_image_store_seconds", "Procesado y subida de imágenes en segundo plano", (), LATENCY_BUCKETS)
+SQL_SECONDS = Histogram("marvel_sql_duration_seconds", "Duración de cada sentencia SQL", (), LATENCY_BUCKETS)
+
+HISTOGRAMS = (
+    REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_SQL, REQUEST_TEMPLATE_SECONDS,
+    REQUEST_UPLOAD_SECONDS, IMAGE_STORE_SECONDS, SQL_SECONDS,
+)
+
+class RequestTimings:
+    __slots__ = ("db", "sql", "template", "upload")
+
+    def __init__(self):
+        self.db = 0.0
+        self.sql = 0
+        self.template = 0.0
+        self.upload = 0.0
+
+# El objeto se comparte por referencia: el threadpool y run_sync copian el
+# contexto, pero siguen acumulando sobre la misma instancia.
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+@contextmanager
+def track(kind: str):
+    # kind: "template" o "upload"; fuera de una petición no se acumula nada
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            setattr(timings, kind, getattr(timings, kind) + time.perf_counter() - start)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("metrics_start")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    SQL_SECONDS.observe(elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.db += elapsed
+        timings.sql += 1
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_start"):
+        conn.info["metrics_start"].pop()
+
+_installed = False
+
+def install():
+    # A nivel de clase Engine: cubre el engine síncrono y el sync_engine del asíncrono
+    global _installed
+    if _installed or not ENABLED:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
+
+def instrument_templates(templates):
+    import jinja2
+
+    class TimedTemplate(jinja2.Template):
+        def render(self, *args, **kwargs):
+            with track("template"):
+                return super().render(*args, **kwargs)
+
+    templates.env.template_class = TimedTemplate
+
+def _route_label(scope) -> str:
+    # Plantilla de la ruta, no la URL: evita una serie por cada id
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    # Middleware ASGI puro: mide también las respuestas en streaming hasta el último bloque
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            method, route = scope["method"], _route_label(scope)
+            REQUEST_SECONDS.observe(elapsed, method, route, str(status[0]))
+            REQUEST_DB_SECONDS.observe(timings.db, method, route)
+            REQUEST_SQL.observe(timings.sql, method, route)
+            if timings.template:
+                REQUEST_TEMPLATE_SECONDS.observe(timings.template, method, route)
+            if timings.upload:
+                REQUEST_UPLOAD_SECONDS.observe(timings.upload, method, route)
+
+def _gauges(pools: Dict[str, dict]):
+    yield "# HELP marvel_db_pool_checked_out Conexiones en uso"
+    yield "# TYPE marvel_db_pool_checked_out gauge"
+    for name, pool in pools.items():
+        if "checked_out" in pool:
+            yield f'marvel_db_pool_checked_out{{pool="{name}"}} {pool["checked_out"]}'
+    yield "# HELP marvel_db_pool_overflow Conexiones por encima de pool_size"
+    yield "# TYPE marvel_db_pool_overflow gauge"
+    for name, pool in pools.items():
+        if "overflow" in pool:
+            yield f'marvel_db_pool_overflow{{pool="{name}"}} {pool["overflow"]}'
+    yield "# HELP marvel_db_pool_timeouts_total Esperas por conexión que agotaron el tiempo"
+    yield "# TYPE marvel_db_pool_timeouts_total counter"
+    for name, pool in pools.items():
+        if "wait" in pool:
+            yield f'marvel_db_pool_timeouts_total{{pool="{name}"}} {pool["wait"]["timeouts"]}'
+
+def _startup_gauges(startup: Dict):
+    yield "# HELP marvel_startup_seconds Duración del arranque del worker, por fase"
+    yield "# TYPE marvel_startup_seconds gauge"
+    yield f'marvel_startup_seconds{{phase="total"}} {startup["total_seconds"]}'
+    for name, seconds in startup["phases"].items():
+        yield f'marvel_startup_seconds{{phase="{_escape(name)}"}} {seconds}'
+    yield "# HELP marvel_lazy_init_seconds Inicialización diferida en el primer uso"
+    yield "# TYPE marvel_lazy_init_seconds gauge"
+    for name, seconds in startup["lazy"].items():
+        yield f'marvel_lazy_init_seconds{{component="{_escape(name)}"}} {seconds}'
+
+def render(pools: Optional[Dict[str, dict]] = None, startup: Optional[Dict] = None) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    if pools:
+        lines.extend(_gauges(pools))
+    if startup:
+        lines.extend(_startup_gauges(startup))
+    return "\n".join(lines) + "\n"
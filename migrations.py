@@ -0,0 +1,136 @@
+import argparse
+import logging
+import os
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+import search
+import versions
+
+logger = logging.getLogger(__name__)
+
+# DB_AUTO_MIGRATE=1 aplica las migraciones al arrancar (desarrollo local);
+# en producción se ejecuta `python migrations.py upgrade` antes de levantar los workers
+AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0").lower() in ("1", "true", "yes")
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str):
+    def decorator(fn):
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+    return decorator
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+# Cada migración debe ser idempotente: las bases creadas antes de existir
+# migraciones ya tienen parte del esquema y pasan por todas desde la 1.
+
+@migration(1, "Tablas base y filas de data_versions")
+def _base_tables(conn):
+    tables = [
+        models.Team.__table__, models.Character.__table__, models.SecretIdentity.__table__,
+        models.CharacterTeam.__table__, models.DataVersion.__table__, models.ImageAsset.__table__,
+    ]
+    for table in tables:
+        table.create(conn, checkfirst=True)
+    versions.setup(conn)
+
+@migration(2, "Índices de búsqueda (pg_trgm / FTS5)")
+def _search_indexes(conn):
+    # Sin permisos para pg_trgm la app sigue funcionando con ILIKE
+    try:
+        with conn.begin_nested():
+            search.create_indexes(conn)
+    except SQLAlchemyError as e:
+        logger.warning("Índices de búsqueda no creados: %s", e)
+
+@migration(3, "Índices de relaciones, únicos por par y parciales sobre active")
+def _query_indexes(conn):
+    # Antes del índice único se eliminan los pares repetidos, conservando el más antiguo
+    ct = models.CharacterTeam.__table__
+    keep = select(func.min(ct.c.id)).group_by(ct.c.character_id, ct.c.team_id)
+    conn.execute(ct.delete().where(ct.c.id.not_in(keep.scalar_subquery())))
+    for index in list(ct.indexes) + list(models.ACTIVE_INDEXES):
+        index.create(conn, checkfirst=True)
+
+def head() -> int:
+    return MIGRATIONS[-1].version
+
+def current_version(bind) -> int:
+    if not inspect(bind).has_table(models.SchemaMigration.__tablename__):
+        return 0
+    with bind.connect() as conn:
+        return conn.execute(select(func.max(models.SchemaMigration.version))).scalar() or 0
+
+def _lock(conn):
+    # Dos procesos que migran a la vez se esperan en PostgreSQL
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(482193)"))
+
+def upgrade(engine, target: Optional[int] = None) -> List[int]:
+    applied = []
+    with engine.begin() as conn:
+        models.SchemaMigration.__table__.create(conn, checkfirst=True)
+    for m in MIGRATIONS:
+        if target is not None and m.version > target:
+            break
+        with engine.begin() as conn:
+            _lock(conn)
+            done = conn.execute(
+                select(models.SchemaMigration.version).where(models.SchemaMigration.version == m.version)
+            ).first()
+            if done:
+                continue
+            logger.info("Aplicando migración %s: %s", m.version, m.description)
+            m.apply(conn)
+            conn.execute(models.SchemaMigration.__table__.insert().values(
+                version=m.version, description=m.description, applied_at=datetime.utcnow()
+            ))
+        applied.append(m.version)
+    return applied
+
+def check(engine):
+    # Solo lectura: el arranque no emite DDL
+    version = current_version(engine)
+    if version < head():
+        raise SchemaOutdated(
+            f"Esquema en la versión {version}, la aplicación requiere la {head()}. "
+            f"Ejecutar: python migrations.py upgrade"
+        )
+    if version > head():
+        logger.warning("El esquema (versión %s) es más nuevo que esta versión de la aplicación (%s)", version, head())
+
+def ensure(engine):
+    if AUTO_MIGRATE:
+        upgrade(engine)
+    check(engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones del esquema")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade")
+    up.add_argument("--to", type=int, help="versión destino (por defecto la última)")
+    sub.add_parser("status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from database import engine
+    if args.command == "upgrade":
+        applied = upgrade(engine, args.to)
+        print(f"Migraciones aplicadas: {applied or 'ninguna'}; versión actual {current_version(engine)}")
+    else:
+        version = current_version(engine)
+        print(f"Versión actual: {version} (última: {head()})")
+        for m in MIGRATIONS:
+            print(f"  [{'x' if m.version <= version else ' '}] {m.version:04d} {m.description}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -16,6 +16,15 @@ class Team(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     members = relationship("CharacterTeam", back_populates="team", cascade="all, delete-orphan")
+    image = relationship("ImageAsset", primaryjoin="foreign(Team.image_url) == ImageAsset.original_url", viewonly=True, uselist=False)
+
+    @property
+    def thumbnail_url(self):
+        return self.image.thumbnail_url if self.image else self.image_url
+
+    @property
+    def web_image_url(self):
+        return self.image.web_url if self.image else self.image_url
 
 class Character(Base):
     __tablename__ = "characters"
@@ -33,6 +42,15 @@ class Character(Base):
 
     teams = relationship("CharacterTeam", back_populates="character", cascade="all, delete-orphan")
     secret_identity = relationship("SecretIdentity", back_populates="character", uselist=False, cascade="all, delete-orphan")
+    image = relationship("ImageAsset", primaryjoin="foreign(Character.image_url) == ImageAsset.original_url", viewonly=True, uselist=False)
+
+    @property
+    def thumbnail_url(self):
+        return self.image.thumbnail_url if self.image else self.image_url
+
+    @property
+    def web_image_url(self):
+        return self.image.web_url if self.image else self.image_url
 
 class SecretIdentity(Base):
     __tablename__ = "secret_identities"
@@ -47,10 +65,53 @@ class SecretIdentity(Base):
 
 class CharacterTeam(Base):
     __tablename__ = "character_team"
+    __table_args__ = (
+        # El índice único cubre también las búsquedas por character_id
+        Index("uq_character_team_character_team", "character_id", "team_id", unique=True),
+        Index("ix_character_team_team_id", "team_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     character_id = Column(Integer, ForeignKey("characters.id"))
     team_id = Column(Integer, ForeignKey("teams.id"))
 
     character = relationship("Character", back_populates="teams")
-    team = relationship("Team", back_populates="members")
\ No newline at end of file
+    team = relationship("Team", back_populates="members")
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ImageAsset(Base):
+    __tablename__ = "image_assets"
+
+    content_hash = Column(String(64), primary_key=True)
+    content_type = Column(String(100), nullable=True)
+    original_url = Column(String, nullable=False, unique=True)
+    web_url = Column(String, nullable=True)
+    thumbnail_url = Column(String, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+def _active_index(name, model, column):
+    # Parcial: los listados solo leen filas activas
+    return Index(name, column, postgresql_where=model.active == True, sqlite_where=model.active == True)
+
+ACTIVE_INDEXES = (
+    _active_index("ix_characters_active_id", Character, Character.id),
+    _active_index("ix_characters_active_name", Character, Character.name),
+    _active_index("ix_teams_active_id", Team, Team.id),
+    _active_index("ix_teams_active_name", Team, Team.name),
+)
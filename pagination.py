@@ -0,0 +1,33 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+
+# Límite de ?limit= en los listados de la API
+MAX_LIMIT = 1000
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    # Un cursor vacío (?after=) pide la primera página en modo keyset: 0 y no
+    # None, para que también se ordene por id y no por relevancia
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return int(json.loads(raw)["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_page(items: list, limit: int) -> dict:
+    # Las consultas piden limit + 1 filas para saber si hay otra página
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = None
+    if has_more and items:
+        # Los listados de la API ya devuelven dicts (listings)
+        last = items[-1]
+        next_cursor = encode_cursor(last["id"] if isinstance(last, dict) else last.id)
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# off: sin costo; warn: registra avisos; raise: la petición falla con 500.
+# raise es solo para tests y desarrollo, nunca para producción
+MODE = os.getenv("QUERY_CHECK", "off").lower()
+N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+DEFAULT_BUDGET = int(os.getenv("QUERY_BUDGET_DEFAULT", "0")) or None
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+_PARAM = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_PARAM_LIST = re.compile(rf"{_PARAM}(?:\s*,\s*{_PARAM})+")
+_LITERAL_LIST = re.compile(r"\((?:\s*\d+\s*,)+\s*\d+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+def shape(statement: str) -> str:
+    # Misma forma = misma sentencia con otros parámetros (o otra lista de IN)
+    statement = _SPACES.sub(" ", statement).strip()
+    statement = _PARAM_LIST.sub("?, ...", statement)
+    return _LITERAL_LIST.sub("(?, ...)", statement)
+
+class QueryLog:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: Optional[int] = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        if threshold is None:
+            return []
+        counts = Counter(shape(s) for s in self.statements)
+        return [(s, n) for s, n in counts.most_common() if n >= threshold]
+
+    def problems(self, budget: Optional[int] = None, threshold: Optional[int] = N_PLUS_ONE_THRESHOLD) -> List[str]:
+        found = []
+        if budget is not None and self.count > budget:
+            found.append(f"{self.count} consultas (presupuesto {budget})")
+        for statement, n in self.repeated(threshold):
+            found.append(f"posible N+1: {n} veces {statement[:200]}")
+        return found
+
+    def assert_ok(self, budget: Optional[int] = None, threshold: Optional[int] = N_PLUS_ONE_THRESHOLD):
+        found = self.problems(budget, threshold)
+        if found:
+            raise QueryBudgetExceeded("; ".join(found))
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+# Capturas globales (fixture de pytest): el TestClient ejecuta la app en otro hilo
+_captures: List[QueryLog] = []
+_captures_lock = threading.Lock()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _current.get()
+    if log is not None:
+        log.statements.append(statement)
+    if _captures:
+        with _captures_lock:
+            for capture_log in _captures:
+                capture_log.statements.append(statement)
+
+_installed = False
+
+def install():
+    global _installed
+    if not _installed:
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _installed = True
+
+@contextmanager
+def capture():
+    install()
+    log = QueryLog()
+    with _captures_lock:
+        _captures.append(log)
+    try:
+        yield log
+    finally:
+        with _captures_lock:
+            _captures.remove(log)
+
+def query_budget(limit: Optional[int], n_plus_one: Optional[int] = N_PLUS_ONE_THRESHOLD) -> Callable:
+    # Máximo de consultas de un endpoint; n_plus_one=None desactiva la detección
+    # de repeticiones (p. ej. lecturas por lotes con yield_per)
+    def decorator(fn):
+        fn.query_budget = (limit, n_plus_one)
+        return fn
+    return decorator
+
+def _route_budget(scope) -> Tuple[str, Optional[int], Optional[int]]:
+    route = scope.get("route")
+    endpoint = getattr(route, "endpoint", None)
+    label = getattr(route, "path_format", None) or scope.get("path", "")
+    limit, n_plus_one = getattr(endpoint, "query_budget", (DEFAULT_BUDGET, N_PLUS_ONE_THRESHOLD))
+    return label, limit, n_plus_one
+
+class QueryCheckMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = _current.set(log)
+        rejected = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route, budget, threshold = _route_budget(scope)
+                found = log.problems(budget, threshold) if MODE == "raise" else []
+                if found:
+                    # Se reemplaza la respuesta antes de enviarla: el cliente ve un 500
+                    rejected.append(f"{scope['method']} {route}: " + "; ".join(found))
+                    await send({
+                        "type": "http.response.start", "status": 500,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                    (b"x-query-count", str(log.count).encode())],
+                    })
+                    await send({"type": "http.response.body", "body": rejected[0].encode()})
+                    return
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-query-count", str(log.count).encode())]
+            elif rejected:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+        if rejected:
+            logger.warning(rejected[0])
+            return
+        route, budget, threshold = _route_budget(scope)
+        found = log.problems(budget, threshold)
+        if found:
+            message = f"{scope['method']} {route}: " + "; ".join(found)
+            if MODE == "raise":
+                # Consultas hechas mientras se enviaba el cuerpo (respuestas en
+                # streaming): la respuesta ya salió y solo queda la excepción
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+def setup(app):
+    if MODE in ("warn", "raise"):
+        install()
+        app.add_middleware(QueryCheckMiddleware)
@@ -1,36 +1,134 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from sqlalchemy.orm import joinedload
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+import boot
 import models
 
-def generar_reporte_pdf(db):
-    personajes = (
-        db.query(models.Character)
+CHUNK_SIZE = 500
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "marvel_reports")
+REPORT_CACHE_KEEP = 2
+# Segundos que un PDF servido queda a salvo de la purga: cubre el tiempo entre
+# que reporte_cacheado devuelve la ruta y FileResponse abre el archivo
+REPORT_CACHE_GRACE = int(os.getenv("REPORT_CACHE_GRACE", "300"))
+
+_render_lock = threading.Lock()
+_reportlab = None
+
+def _load_reportlab():
+    # ReportLab solo se importa con el primer PDF: no pesa en el arranque del worker
+    global _reportlab
+    if _reportlab is None:
+        with boot.lazy("reportlab"):
+            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        _reportlab = (letter, getSampleStyleSheet, SimpleDocTemplate, Paragraph, Spacer)
+    return _reportlab
+
+class _StreamedFlowables(list):
+    # ReportLab consume la lista desde el frente y siempre consulta len()
+    # antes de cada paso: ahí se rellena desde el generador, así nunca hay
+    # más que unos pocos flowables en memoria. Depende de cómo recorre
+    # BaseDocTemplate.build la lista: tests/test_reports.py lo fija.
+    def __init__(self, source, lookahead: int = 32):
+        super().__init__()
+        self._source = iter(source)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+def _personajes(db):
+    # yield_per: lotes de CHUNK_SIZE filas (cursor del lado del servidor en PostgreSQL)
+    stmt = (
+        select(models.Character)
         .options(
-            joinedload(models.Character.secret_identity),
-            joinedload(models.Character.teams).joinedload(models.CharacterTeam.team)
+            selectinload(models.Character.secret_identity),
+            selectinload(models.Character.teams).selectinload(models.CharacterTeam.team)
         )
-        .all()
+        .order_by(models.Character.id)
+        .execution_options(yield_per=CHUNK_SIZE)
     )
+    return db.scalars(stmt)
 
-    nombre_archivo = "reporte_marvel.pdf"
-    doc = SimpleDocTemplate(nombre_archivo, pagesize=letter)
-    story = []
-    styles = getSampleStyleSheet()
-
-    story.append(Paragraph("Reporte Marvel API", styles["Title"]))
-    story.append(Spacer(1, 12))
+def _story(db, styles):
+    _, _, _, Paragraph, Spacer = _load_reportlab()
+    yield Paragraph("Reporte Marvel API", styles["Title"])
+    yield Spacer(1, 12)
 
-    for c in personajes:
+    for c in _personajes(db):
         identidad = c.secret_identity.real_name if c.secret_identity else "Desconocida"
         equipos = ", ".join([t.team.name for t in c.teams if t.team]) if c.teams else "Ninguno"
-        story.append(Paragraph(f"<b>Personaje:</b> {c.name}", styles["Heading3"]))
-        story.append(Paragraph(f"Identidad secreta: {identidad}", styles["Normal"]))
-        story.append(Paragraph(f"Equipos: {equipos}", styles["Normal"]))
+        yield Paragraph(f"<b>Personaje:</b> {c.name}", styles["Heading3"])
+        yield Paragraph(f"Identidad secreta: {identidad}", styles["Normal"])
+        yield Paragraph(f"Equipos: {equipos}", styles["Normal"])
         if c.image_url:
-            story.append(Paragraph(f"Imagen: {c.image_url}", styles["Normal"]))
-        story.append(Spacer(1, 10))
+            yield Paragraph(f"Imagen: {c.image_url}", styles["Normal"])
+        yield Spacer(1, 10)
+
+def generar_reporte_pdf(db, destino):
+    # destino: ruta o archivo abierto en modo binario
+    letter, getSampleStyleSheet, SimpleDocTemplate, _, _ = _load_reportlab()
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    styles = getSampleStyleSheet()
+    doc.build(_StreamedFlowables(_story(db, styles)))
+
+def _mtime(ruta: str) -> float:
+    try:
+        return os.path.getmtime(ruta)
+    except OSError:
+        return 0.0
+
+def _purge_reportes(actual: str):
+    archivos = [
+        os.path.join(REPORT_CACHE_DIR, n) for n in os.listdir(REPORT_CACHE_DIR)
+        if n.startswith("reporte_") and n.endswith(".pdf")
+    ]
+    fechas = {ruta: _mtime(ruta) for ruta in archivos}
+    archivos.sort(key=fechas.get, reverse=True)
+    limite = time.time() - REPORT_CACHE_GRACE
+    for ruta in archivos[REPORT_CACHE_KEEP:]:
+        # Solo se borra lo que nadie pidió dentro del periodo de gracia
+        if ruta != actual and fechas[ruta] < limite:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+def _usar(ruta: str) -> bool:
+    # Renueva la fecha del PDF servido para que la purga lo respete
+    try:
+        os.utime(ruta)
+        return True
+    except OSError:
+        return False
 
-    doc.build(story)
-    return nombre_archivo
\ No newline at end of file
+def reporte_cacheado(db, clave: str) -> str:
+    # clave: huella de las versiones de datos; si no cambió se reutiliza el PDF.
+    # El archivo se escribe aparte y se publica con os.replace, así otros
+    # workers del mismo host nunca leen un PDF a medias.
+    ruta = os.path.join(REPORT_CACHE_DIR, f"reporte_{clave}.pdf")
+    if _usar(ruta):
+        return ruta
+    with _render_lock:
+        if _usar(ruta):
+            return ruta
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                generar_reporte_pdf(db, f)
+            os.replace(tmp, ruta)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        _purge_reportes(ruta)
+    return ruta
@@ -1,30 +1,128 @@
+import argparse
+import os
+import time
+from datetime import date, datetime
+from typing import Dict, List
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, text
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from database import get_db
+import cache
+import exporter
+import importer
 import models
+import search
+import versions
+
+# Orden de borrado: primero las tablas que referencian a otras
+TABLES = (models.CharacterTeam, models.SecretIdentity, models.Character, models.Team)
+# Orden de carga de una instantánea: el inverso
+LOAD_ORDER = ("teams", "characters", "identities", "character_team")
+BATCH_SIZE = 5000
+
+def truncate(db: Session):
+    # Deja la transacción abierta: quien llama carga datos (opcional) y luego finish()
+    dialect = db.get_bind().dialect.name
+    names = [m.__tablename__ for m in TABLES]
+    if dialect == "postgresql":
+        print("Vaciando tablas con TRUNCATE ... RESTART IDENTITY...")
+        db.execute(text(f"TRUNCATE TABLE {', '.join(names)} RESTART IDENTITY CASCADE"))
+        return
+    search.suspend_sync(db.connection())
+    print("Borrando tablas...")
+    for name in names:
+        # Sin triggers ni WHERE, SQLite vacía la tabla sin recorrerla fila a fila
+        db.execute(text(f"DELETE FROM {name}"))
+    if dialect == "sqlite":
+        has_sequence = db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")).first()
+        if has_sequence:
+            db.execute(text("DELETE FROM sqlite_sequence WHERE name IN ({})".format(", ".join(f"'{n}'" for n in names))))
 
-def reset_db(db: Session):
-    print("Borrando Character-Team...")
-    db.query(models.CharacterTeam).delete()
-    
-    print("Borrando Secret Identities...")
-    db.query(models.SecretIdentity).delete()
-    
-    print("Borrando Characters...")
-    db.query(models.Character).delete()
-    
-    print("Borrando Teams...")
-    db.query(models.Team).delete()
-    
-    print("Reiniciando IDs...")
-    db.execute(text("ALTER SEQUENCE character_team_id_seq RESTART WITH 1;"))
-    db.execute(text("ALTER SEQUENCE secret_identities_id_seq RESTART WITH 1;"))
-    db.execute(text("ALTER SEQUENCE characters_id_seq RESTART WITH 1;"))
-    db.execute(text("ALTER SEQUENCE teams_id_seq RESTART WITH 1;"))
-    
+def finish(db: Session):
+    versions.bump(db, *versions.ALL_TABLES)
     db.commit()
-    print("Base de datos reseteada con exito.")
+    search.setup(db.get_bind(), rebuild=True)
+    cache.entities.clear()
+
+def _coerce(model, row: Dict) -> Dict:
+    # Las instantáneas vienen de exporter: fechas ISO y, en CSV, todo texto
+    data = {}
+    for column in model.__table__.columns:
+        value = row.get(column.name)
+        if value is None or value == "":
+            continue
+        if isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value) if isinstance(value, str) else value
+        elif isinstance(column.type, Date):
+            value = date.fromisoformat(value) if isinstance(value, str) else value
+        elif isinstance(column.type, Boolean):
+            value = value.lower() in ("1", "true") if isinstance(value, str) else bool(value)
+        elif isinstance(column.type, Integer):
+            value = int(value)
+        data[column.name] = value
+    return data
+
+def _snapshot_file(path: str, entity: str):
+    for fmt in ("ndjson", "csv"):
+        candidate = os.path.join(path, f"{entity}.{fmt}")
+        if os.path.exists(candidate):
+            return candidate, fmt
+    return None, None
+
+def load_fixture(db: Session, path: str) -> Dict[str, int]:
+    # Sin validación fila a fila: la instantánea es de confianza y conserva los ids
+    loaded = {}
+    for entity in LOAD_ORDER:
+        filename, fmt = _snapshot_file(path, entity)
+        if not filename:
+            continue
+        model, _ = importer.ENTITIES[entity]
+        total = 0
+        with open(filename, encoding="utf-8-sig", newline="") as f:
+            batch: List[Dict] = []
+            for raw in importer.read_rows(f, fmt):
+                if isinstance(raw, Exception):
+                    raise ValueError(f"{filename}: {raw}")
+                batch.append(_coerce(model, raw))
+                if len(batch) >= BATCH_SIZE:
+                    importer.bulk_insert(db, model, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                importer.bulk_insert(db, model, batch)
+                total += len(batch)
+        importer.sync_sequence(db, model.__tablename__)
+        loaded[entity] = total
+        print(f"Cargados {total} registros en {model.__tablename__}")
+    return loaded
+
+def dump_fixture(path: str):
+    os.makedirs(path, exist_ok=True)
+    for entity in LOAD_ORDER:
+        with open(os.path.join(path, f"{entity}.ndjson"), "wb") as f:
+            for chunk in exporter.stream_export(entity, "ndjson"):
+                f.write(chunk)
+        print(f"Exportado {entity}")
+
+def reset_db(db: Session, fixture: str = None):
+    start = time.perf_counter()
+    truncate(db)
+    if fixture:
+        load_fixture(db, fixture)
+    finish(db)
+    print(f"Base de datos reseteada con exito en {time.perf_counter() - start:.2f} s.")
 
 if __name__ == "__main__":
-    db = next(get_db())
-    reset_db(db)
+    parser = argparse.ArgumentParser(description="Vacía la base y opcionalmente carga una instantánea")
+    parser.add_argument("--fixture", help="directorio con {teams,characters,identities,character_team}.ndjson|csv")
+    parser.add_argument("--dump", help="guarda una instantánea de los datos actuales en este directorio y termina")
+    args = parser.parse_args()
+
+    if args.dump:
+        dump_fixture(args.dump)
+    else:
+        db = next(get_db())
+        try:
+            reset_db(db, args.fixture)
+        finally:
+            db.close()
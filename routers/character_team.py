@@ -1,23 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional, Union
+import crud_async, schemas
+from crud_async import AnySession
+import fastjson
+import fieldsets
+import pagination
+import versions
+from database import get_db_session
+from querycount import query_budget
 
 router = APIRouter(tags=["Character-Team"])
 
 @router.post("/character_team", response_model=schemas.CharacterTeam)
-def api_create_character_team(ct: schemas.CharacterTeamCreate, db: Session = Depends(get_db)):
+async def api_create_character_team(ct: schemas.CharacterTeamCreate, db: AnySession = Depends(get_db_session)):
     try:
-        return crud.create_character_team(db, ct)
+        return await crud_async.create_character_team(db, ct)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/character_team", response_model=List[schemas.CharacterTeam])
-def api_list_character_team(db: Session = Depends(get_db)):
-    return crud.get_character_teams(db)
+@router.get("/character_team", response_model=Union[schemas.CharacterTeamPage, List[schemas.CharacterTeam]])
+@query_budget(10)
+async def api_list_character_team(
+    request: Request, response: Response, after: Optional[str] = None,
+    skip: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_LIMIT),
+    fields: Optional[str] = Query(None, description="campos separados por coma; el id siempre se incluye"),
+    expand: Optional[str] = Query(None, description="character,team"),
+    db: AnySession = Depends(get_db_session),
+):
+    selection = fieldsets.parse(fieldsets.CHARACTER_TEAM, fields, expand)
+    not_modified = await crud_async.conditional_get(request, response, db, versions.CHARACTER_TEAM_TABLES)
+    if not_modified:
+        return not_modified
+    if after is None:
+        result = await crud_async.get_character_teams(db, selection=selection, skip=skip, limit=limit)
+    else:
+        limit = limit or 100
+        after_id = pagination.decode_cursor(after)
+        items = await crud_async.get_character_teams(db, selection=selection, limit=limit + 1, after_id=after_id)
+        result = pagination.build_page(items, limit)
+    return fastjson.respond(response, result)
 
 @router.delete("/character_team/{ct_id}")
-def api_delete_character_team(ct_id: int, db: Session = Depends(get_db)):
-    crud.delete_character_team(db, ct_id)
+async def api_delete_character_team(ct_id: int, db: AnySession = Depends(get_db_session)):
+    await crud_async.delete_character_team(db, ct_id)
     return {"message": "Character-Team relationship deleted"}
\ No newline at end of file
@@ -1,23 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import crud, schemas
-from database import get_db
-from supabase_client import upload_image_to_supabase
-import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
+from typing import List, Optional, Union
+import crud_async, schemas
+from crud_async import AnySession
+import fastjson
+import fieldsets
+import pagination
+import versions
+from database import get_db_session
+import crud
+import images
+import storage
+from querycount import query_budget
 
 router = APIRouter(tags=["Characters"])
 
-@router.get("/characters", response_model=List[schemas.Character])
-def api_get_characters(q: Optional[str] = "", skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_characters(db, q=q, skip=skip, limit=limit)
+@router.get("/characters", response_model=Union[schemas.CharacterPage, List[schemas.Character]])
+@query_budget(8)
+async def api_get_characters(
+    request: Request, response: Response, q: Optional[str] = "", after: Optional[str] = None,
+    skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=pagination.MAX_LIMIT),
+    fields: Optional[str] = Query(None, description="campos separados por coma; el id siempre se incluye"),
+    expand: Optional[str] = Query(None, description="identity,teams"),
+    db: AnySession = Depends(get_db_session),
+):
+    selection = fieldsets.parse(fieldsets.CHARACTER, fields, expand)
+    not_modified = await crud_async.conditional_get(request, response, db, versions.CHARACTER_TABLES)
+    if not_modified:
+        return not_modified
+    if after is None:
+        result = await crud_async.get_characters(db, selection=selection, q=q, skip=skip, limit=limit)
+    else:
+        after_id = pagination.decode_cursor(after)
+        items = await crud_async.get_characters(db, selection=selection, q=q, limit=limit + 1, after_id=after_id)
+        result = pagination.build_page(items, limit)
+    return fastjson.respond(response, result)
 
 @router.get("/characters/{character_id}", response_model=schemas.Character)
-def api_get_character(character_id: int, db: Session = Depends(get_db)):
-    c = crud.get_character(db, character_id)
+@query_budget(4)
+async def api_get_character(
+    character_id: int, request: Request, response: Response,
+    fields: Optional[str] = Query(None, description="campos separados por coma; el id siempre se incluye"),
+    expand: Optional[str] = Query(None, description="identity,teams"),
+    db: AnySession = Depends(get_db_session),
+):
+    selection = fieldsets.parse(fieldsets.CHARACTER, fields, expand)
+    state = await crud_async.data_versions(db, versions.CHARACTER_TABLES)
+    # Primero la existencia: If-None-Match: * no debe dar 304 para un id inexistente
+    c = await crud_async.get_character_cached(db, character_id, state)
     if not c:
         raise HTTPException(status_code=404, detail="Character not found")
-    return c
+    not_modified = await crud_async.conditional_get(request, response, db, versions.CHARACTER_TABLES, state)
+    if not_modified:
+        return not_modified
+    # El detalle completo ya está en caché: solo se recorta
+    return fastjson.respond(response, fieldsets.dump_schema(fieldsets.CHARACTER, c, selection)) if selection else c
 @router.post("/characters", response_model=schemas.Character)
 async def api_create_character(
     name: str = Form(...),
@@ -25,40 +61,64 @@ async def api_create_character(
     alignment: str = Form(...),
     description: str = Form(None),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_db_session)
 ):
-    image_url = None
-    if image:
-        content = await image.read()
-        safe_name = f"{name.replace(' ','_')}_{image.filename}"
-        try:
-            image_url = upload_image_to_supabase(content, safe_name, content_type=image.content_type)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+    staged = await storage.stage_upload(image)
 
     char_schema = schemas.CharacterCreate(
         name=name, alias=alias, alignment=alignment, description=description, active=True
     )
 
-    return crud.create_character(db, char_schema, image_url=image_url)
+    # La fila se crea ya; image_url se completa cuando termina la subida
+    created = await crud_async.create_character(db, char_schema, image_filename=staged.filename if staged else None)
+    if staged:
+        images.enqueue(
+            staged,
+            storage.save_image_url(crud.set_character_image, created.id),
+        )
+    return created
 
 @router.put("/characters/{character_id}", response_model=schemas.Character)
-def api_update_character(character_id: int, character: schemas.CharacterCreate, db: Session = Depends(get_db)):
-    updated = crud.update_character(db, character_id, character)
+@query_budget(4)
+async def api_update_character(character_id: int, character: schemas.CharacterCreate, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.update_character(db, character_id, character.dict())
+    if not updated:
+        raise HTTPException(status_code=404, detail="Character not found")
+    # PUT devuelve el detalle completo: se vuelve a cachear y la próxima lectura ya lo encuentra
+    return await crud_async.get_character_cached(db, character_id)
+
+@router.patch("/characters/{character_id}", response_model=schemas.CharacterRow)
+@query_budget(2)
+async def api_patch_character(character_id: int, character: schemas.CharacterUpdate, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.update_character(db, character_id, character.dict(exclude_unset=True))
     if not updated:
         raise HTTPException(status_code=404, detail="Character not found")
     return updated
 
 @router.delete("/characters/{character_id}")
-def api_delete_character(character_id: int, db: Session = Depends(get_db)):
-    deleted = crud.soft_delete_character(db, character_id)
+@query_budget(2)
+async def api_delete_character(character_id: int, db: AnySession = Depends(get_db_session)):
+    deleted = await crud_async.soft_delete_character(db, character_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Character not found")
     return {"message": "Character soft-deleted"}
 
 @router.put("/characters/{character_id}/restore")
-def api_restore_character(character_id: int, db: Session = Depends(get_db)):
-    restored = crud.restore_character(db, character_id)
+@query_budget(2)
+async def api_restore_character(character_id: int, db: AnySession = Depends(get_db_session)):
+    restored = await crud_async.restore_character(db, character_id)
     if not restored:
         raise HTTPException(status_code=404, detail="Character not found")
     return {"message": "Character restored"}
+
+@router.post("/characters/bulk/delete", response_model=schemas.BulkResult)
+@query_budget(2)
+async def api_bulk_delete_characters(body: schemas.BulkIds, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.set_characters_active(db, body.ids, False)
+    return {"updated": updated, "missing": sorted(set(body.ids) - set(updated))}
+
+@router.post("/characters/bulk/restore", response_model=schemas.BulkResult)
+@query_budget(2)
+async def api_bulk_restore_characters(body: schemas.BulkIds, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.set_characters_active(db, body.ids, True)
+    return {"updated": updated, "missing": sorted(set(body.ids) - set(updated))}
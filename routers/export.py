@@ -0,0 +1,28 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import exporter
+
+router = APIRouter(tags=["Export"])
+
+@router.get("/export/{entity}")
+def api_export(
+    entity: str,
+    request: Request,
+    format: str = "ndjson",
+    active: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    gzip: Optional[bool] = None,
+):
+    if entity not in exporter.COLUMNS:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    if format not in exporter.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+    if gzip is None:
+        gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f'attachment; filename="{entity}.{format}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    body = exporter.stream_export(entity, format, active=active, since=since, compress=gzip)
+    return StreamingResponse(body, media_type=exporter.MEDIA_TYPES[format], headers=headers)
\ No newline at end of file
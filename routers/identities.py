@@ -1,33 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional, Union
+import crud_async, schemas
+from crud_async import AnySession
+import fastjson
+import pagination
+import versions
+from database import get_db_session
+from querycount import query_budget
 
 router = APIRouter(tags=["Secret Identities"])
 
-@router.get("/identities", response_model=List[schemas.SecretIdentity])
-def api_get_identities(db: Session = Depends(get_db)):
-    return crud.get_identities(db)
+@router.get("/identities", response_model=Union[schemas.SecretIdentityPage, List[schemas.SecretIdentity]])
+@query_budget(4)
+async def api_get_identities(
+    request: Request, response: Response, skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_LIMIT), after: Optional[str] = None,
+    db: AnySession = Depends(get_db_session),
+):
+    not_modified = await crud_async.conditional_get(request, response, db, versions.IDENTITY_TABLES)
+    if not_modified:
+        return not_modified
+    if after is None:
+        result = await crud_async.get_identities(db, skip=skip, limit=limit)
+    else:
+        limit = limit or 100
+        after_id = pagination.decode_cursor(after)
+        items = await crud_async.get_identities(db, limit=limit + 1, after_id=after_id)
+        result = pagination.build_page(items, limit)
+    return fastjson.respond(response, result)
 
 @router.get("/identities/{identity_id}", response_model=schemas.SecretIdentity)
-def api_get_identity(identity_id: int, db: Session = Depends(get_db)):
-    ident = crud.get_identity(db, identity_id)
+@query_budget(4)
+async def api_get_identity(identity_id: int, request: Request, response: Response, db: AnySession = Depends(get_db_session)):
+    state = await crud_async.data_versions(db, versions.IDENTITY_TABLES)
+    # Primero la existencia: If-None-Match: * no debe dar 304 para un id inexistente
+    ident = await crud_async.get_identity_cached(db, identity_id, state)
     if not ident:
         raise HTTPException(status_code=404, detail="Identity not found")
+    not_modified = await crud_async.conditional_get(request, response, db, versions.IDENTITY_TABLES, state)
+    if not_modified:
+        return not_modified
     return ident
 
 @router.post("/identities", response_model=schemas.SecretIdentity)
-def api_create_identity(identity: schemas.SecretIdentityCreate, db: Session = Depends(get_db)):
+async def api_create_identity(identity: schemas.SecretIdentityCreate, db: AnySession = Depends(get_db_session)):
     try:
-        return crud.create_identity(db, identity)
+        return await crud_async.create_identity(db, identity)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/identities/{identity_id}", response_model=schemas.SecretIdentity)
-def api_update_identity(identity_id: int, identity: schemas.SecretIdentityCreate, db: Session = Depends(get_db)):
+async def api_update_identity(identity_id: int, identity: schemas.SecretIdentityCreate, db: AnySession = Depends(get_db_session)):
     try:
-        updated = crud.update_identity(db, identity_id, identity)
+        updated = await crud_async.update_identity(db, identity_id, identity)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     if not updated:
@@ -35,9 +60,9 @@ def api_update_identity(identity_id: int, identity: schemas.SecretIdentityCreate
     return updated
 
 @router.delete("/identities/{identity_id}")
-def api_delete_identity(identity_id: int, db: Session = Depends(get_db)):
-    ident = crud.get_identity(db, identity_id)
+async def api_delete_identity(identity_id: int, db: AnySession = Depends(get_db_session)):
+    ident = await crud_async.get_identity(db, identity_id)
     if not ident:
         raise HTTPException(status_code=404, detail="Identity not found")
-    crud.delete_identity(db, identity_id)
+    await crud_async.delete_identity(db, identity_id)
     return {"message": "Identity deleted"}
\ No newline at end of file
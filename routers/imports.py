@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from database import get_db
+import importer
+
+router = APIRouter(tags=["Import"])
+
+@router.post("/import/{entity}")
+async def api_import(entity: str, file: UploadFile = File(...), format: Optional[str] = None, db: Session = Depends(get_db)):
+    if entity not in importer.ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    fmt = format or importer.detect_format(file.filename, file.content_type)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format must be csv or ndjson")
+    try:
+        return await run_in_threadpool(importer.import_file, db, entity, file.file, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -1,18 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import FileResponse
-from database import get_db
-import reports, crud
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from database import get_db, get_db_session
+import reports, crud_async
+import versions
+import stats
+from crud_async import AnySession
+from querycount import query_budget
 
 router = APIRouter(tags=["Reports"])
 
+def _reporte(request: Request, response: Response, db: Session):
+    state = versions.current(db, versions.REPORT_TABLES)
+    not_modified = versions.conditional_get(request, response, db, versions.REPORT_TABLES, state=state)
+    if not_modified:
+        return not_modified, None
+    return None, reports.reporte_cacheado(db, versions.fingerprint(state))
+
 @router.get("/report/pdf")
-def api_generate_pdf(db = Depends(get_db)):
+@query_budget(None, n_plus_one=None)
+async def api_generate_pdf(request: Request, response: Response, db: Session = Depends(get_db)):
+    # El render es CPU: siempre en el threadpool, con una sesión síncrona propia
     try:
-        archivo = reports.generar_reporte_pdf(db)
-        return FileResponse(archivo, media_type="application/pdf", filename="reporte_marvel.pdf")
+        not_modified, ruta = await run_in_threadpool(_reporte, request, response, db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not_modified:
+        return not_modified
+    return FileResponse(ruta, media_type="application/pdf", filename="reporte_marvel.pdf", headers=dict(response.headers))
 
 @router.get("/report/stats")
-def api_stats(db = Depends(get_db)):
-    return crud.get_stats(db)
\ No newline at end of file
+@query_budget(6)
+async def api_stats(request: Request, response: Response, db: AnySession = Depends(get_db_session)):
+    not_modified = await crud_async.conditional_get(request, response, db, stats.TABLES)
+    if not_modified:
+        return not_modified
+    return await crud_async.get_stats(db)
\ No newline at end of file
@@ -1,22 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import crud, schemas
-from database import get_db
-from supabase_client import upload_image_to_supabase
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
+from typing import List, Optional, Union
+import crud_async, schemas
+from crud_async import AnySession
+import fastjson
+import fieldsets
+import pagination
+import versions
+from database import get_db_session
+import crud
+import images
+import storage
+from querycount import query_budget
 
 router = APIRouter(tags=["Teams"])
 
-@router.get("/teams", response_model=List[schemas.Team])
-def api_get_teams(q: Optional[str] = "", skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_teams(db, q=q, skip=skip, limit=limit)
+def _tables(selection):
+    # Con ?expand=members la respuesta depende también de personajes y relaciones
+    if selection and "members" in selection.expand:
+        return versions.TEAM_MEMBERS_TABLES
+    return versions.TEAM_TABLES
+
+@router.get("/teams", response_model=Union[schemas.TeamPage, List[schemas.Team]])
+@query_budget(5)
+async def api_get_teams(
+    request: Request, response: Response, q: Optional[str] = "", after: Optional[str] = None,
+    skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=pagination.MAX_LIMIT),
+    fields: Optional[str] = Query(None, description="campos separados por coma; el id siempre se incluye"),
+    expand: Optional[str] = Query(None, description="members"),
+    db: AnySession = Depends(get_db_session),
+):
+    selection = fieldsets.parse(fieldsets.TEAM, fields, expand)
+    not_modified = await crud_async.conditional_get(request, response, db, _tables(selection))
+    if not_modified:
+        return not_modified
+    if after is None:
+        result = await crud_async.get_teams(db, selection=selection, q=q, skip=skip, limit=limit)
+    else:
+        after_id = pagination.decode_cursor(after)
+        items = await crud_async.get_teams(db, selection=selection, q=q, limit=limit + 1, after_id=after_id)
+        result = pagination.build_page(items, limit)
+    return fastjson.respond(response, result)
 
 @router.get("/teams/{team_id}", response_model=schemas.Team)
-def api_get_team(team_id: int, db: Session = Depends(get_db)):
-    t = crud.get_team(db, team_id)
+@query_budget(4)
+async def api_get_team(
+    team_id: int, request: Request, response: Response,
+    fields: Optional[str] = Query(None, description="campos separados por coma; el id siempre se incluye"),
+    expand: Optional[str] = Query(None, description="members"),
+    db: AnySession = Depends(get_db_session),
+):
+    selection = fieldsets.parse(fieldsets.TEAM, fields, expand)
+    tables = _tables(selection)
+    state = await crud_async.data_versions(db, tables)
+    # Primero la existencia: If-None-Match: * no debe dar 304 para un id inexistente
+    t = await crud_async.get_team_cached(db, team_id, state)
     if not t:
         raise HTTPException(status_code=404, detail="Team not found")
-    return t
+    not_modified = await crud_async.conditional_get(request, response, db, tables, state)
+    if not_modified:
+        return not_modified
+    if not selection:
+        return t
+    result = fieldsets.dump_schema(fieldsets.TEAM, t, selection)
+    if "members" in selection.expand:
+        # Los miembros no forman parte del equipo en caché
+        result["members"] = await crud_async.get_team_members(db, team_id)
+    return fastjson.respond(response, result)
 
 @router.post("/teams", response_model=schemas.Team)
 async def api_create_team(
@@ -24,36 +73,69 @@ async def api_create_team(
     founded_date: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_db_session)
 ):
-    image_filename = None
-    image_url = None
-    if image:
-        content = await image.read()
-        safe_name = f"teams/{name.replace(' ','_')}_{image.filename}"
-        image_url = upload_image_to_supabase(content, safe_name, content_type=image.content_type)
-        image_filename = image.filename
+    staged = await storage.stage_upload(image)
 
     team_schema = schemas.TeamCreate(name=name, founded_date=None, description=description, active=True)
-    return crud.create_team(db, team_schema, image_filename=image_filename, image_url=image_url)
+    created = await crud_async.create_team(db, team_schema, image_filename=staged.filename if staged else None)
+    if staged:
+        images.enqueue(
+            staged,
+            storage.save_image_url(crud.set_team_image, created.id),
+        )
+    return created
 
 @router.put("/teams/{team_id}", response_model=schemas.Team)
-def api_update_team(team_id: int, team: schemas.TeamCreate, db: Session = Depends(get_db)):
-    updated = crud.update_team(db, team_id, team)
+@query_budget(5)
+async def api_update_team(team_id: int, team: schemas.TeamCreate, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.update_team(db, team_id, team.dict())
+    if not updated:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return await crud_async.get_team_cached(db, team_id)
+
+@router.patch("/teams/{team_id}", response_model=schemas.TeamRow)
+@query_budget(3)
+async def api_patch_team(team_id: int, team: schemas.TeamUpdate, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.update_team(db, team_id, team.dict(exclude_unset=True))
     if not updated:
         raise HTTPException(status_code=404, detail="Team not found")
     return updated
 
+@router.put("/teams/{team_id}/members", response_model=schemas.TeamMembers)
+async def api_set_team_members(team_id: int, members: schemas.TeamMembersUpdate, db: AnySession = Depends(get_db_session)):
+    try:
+        result = await crud_async.set_team_members(db, team_id, members)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return result
+
 @router.delete("/teams/{team_id}")
-def api_delete_team(team_id: int, db: Session = Depends(get_db)):
-    deleted = crud.soft_delete_team(db, team_id)
+@query_budget(3)
+async def api_delete_team(team_id: int, db: AnySession = Depends(get_db_session)):
+    deleted = await crud_async.soft_delete_team(db, team_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Team not found")
     return {"message": "Team soft-deleted"}
 
 @router.put("/teams/{team_id}/restore")
-def api_restore_team(team_id: int, db: Session = Depends(get_db)):
-    restored = crud.restore_team(db, team_id)
+@query_budget(3)
+async def api_restore_team(team_id: int, db: AnySession = Depends(get_db_session)):
+    restored = await crud_async.restore_team(db, team_id)
     if not restored:
         raise HTTPException(status_code=404, detail="Team not found")
-    return {"message": "Team restored"}
\ No newline at end of file
+    return {"message": "Team restored"}
+
+@router.post("/teams/bulk/delete", response_model=schemas.BulkResult)
+@query_budget(3)
+async def api_bulk_delete_teams(body: schemas.BulkIds, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.set_teams_active(db, body.ids, False)
+    return {"updated": updated, "missing": sorted(set(body.ids) - set(updated))}
+
+@router.post("/teams/bulk/restore", response_model=schemas.BulkResult)
+@query_budget(3)
+async def api_bulk_restore_teams(body: schemas.BulkIds, db: AnySession = Depends(get_db_session)):
+    updated = await crud_async.set_teams_active(db, body.ids, True)
+    return {"updated": updated, "missing": sorted(set(body.ids) - set(updated))}
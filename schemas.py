@@ -14,10 +14,32 @@ class TeamCreate(TeamBase):
 class Team(TeamBase):
     id: int
     image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+class TeamUpdate(BaseModel):
+    # PATCH: solo se escriben los campos enviados; null no vale en los obligatorios
+    name: str = Field(None, min_length=2)
+    founded_date: Optional[date] = None
+    description: Optional[str] = None
+    active: bool = None
+
+class TeamRow(TeamBase):
+    id: int
+    image_url: Optional[str] = None
+
+class TeamSummary(BaseModel):
+    id: int
+    name: str
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+class TeamPage(BaseModel):
+    items: List[Team]
+    next_cursor: Optional[str] = None
+
 class SecretIdentityBase(BaseModel):
     real_name: str
     birth_date: Optional[date] = None
@@ -33,6 +55,10 @@ class SecretIdentity(SecretIdentityBase):
     class Config:
         orm_mode = True
 
+class SecretIdentityPage(BaseModel):
+    items: List[SecretIdentity]
+    next_cursor: Optional[str] = None
+
 class CharacterTeamBase(BaseModel):
     character_id: int
     team_id: int
@@ -40,6 +66,13 @@ class CharacterTeamBase(BaseModel):
 class CharacterTeamCreate(CharacterTeamBase):
     pass
 
+class CharacterTeamMember(CharacterTeamBase):
+    id: int
+    team: Optional[Team] = None
+
+    class Config:
+        orm_mode = True
+
 class CharacterTeam(CharacterTeamBase):
     id: int
     character: Optional["Character"] = None
@@ -61,8 +94,55 @@ class CharacterCreate(CharacterBase):
 
 class Character(CharacterBase):
     id: int
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
     secret_identity: Optional[SecretIdentity] = None
-    teams: List[CharacterTeam] = []
+    teams: List[CharacterTeamMember] = []
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class CharacterUpdate(BaseModel):
+    name: str = Field(None, min_length=2)
+    alias: Optional[str] = None
+    alignment: str = Field(None, min_length=3)
+    first_appearance: Optional[date] = None
+    description: Optional[str] = None
+    active: bool = None
+
+class CharacterRow(CharacterBase):
+    id: int
+    image_url: Optional[str] = None
+
+class CharacterSummary(BaseModel):
+    id: int
+    name: str
+    alias: Optional[str] = None
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+class CharacterPage(BaseModel):
+    items: List[Character]
+    next_cursor: Optional[str] = None
+
+class TeamMembersUpdate(BaseModel):
+    character_ids: Optional[List[int]] = None
+    add: List[int] = []
+    remove: List[int] = []
+
+class TeamMembers(BaseModel):
+    team_id: int
+    character_ids: List[int]
+    added: List[int]
+    removed: List[int]
+
+class BulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class BulkResult(BaseModel):
+    updated: List[int]
+    missing: List[int]
+
+class CharacterTeamPage(BaseModel):
+    items: List[CharacterTeam]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,169 @@
+import logging
+import math
+import os
+from typing import List, Optional
+
+from sqlalchemy import case, func, literal, literal_column, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+
+logger = logging.getLogger(__name__)
+
+# Columnas buscables por modelo y su tabla FTS5 espejo en SQLite
+SEARCH_FIELDS = {
+    models.Character: ("characters_fts", ("name", "alias")),
+    models.Team: ("teams_fts", ("name",)),
+}
+
+# Fracción mínima de trigramas de la búsqueda que debe contener un campo en
+# SQLite; el mismo umbral que pg_trgm.word_similarity_threshold en PostgreSQL
+SIMILARITY = float(os.getenv("SEARCH_SIMILARITY", "0.6"))
+
+# "postgresql" (pg_trgm), "sqlite" (FTS5 trigram) o None (ILIKE sin índice)
+_backend: Optional[str] = None
+
+def create_indexes(conn, rebuild: bool = False):
+    # DDL de búsqueda; lo ejecutan las migraciones y reset_db, nunca el arranque.
+    # rebuild: reindexa FTS desde cero (tras una carga masiva sin triggers)
+    if conn.dialect.name == "postgresql":
+        _setup_postgresql(conn)
+    elif conn.dialect.name == "sqlite":
+        _setup_sqlite(conn, rebuild)
+
+def setup(engine, rebuild: bool = False):
+    try:
+        with engine.begin() as conn:
+            create_indexes(conn, rebuild)
+    except SQLAlchemyError as e:
+        logger.warning("No se pudieron crear los índices de búsqueda: %s", e)
+    init(engine)
+
+def init(engine):
+    # Al arrancar solo se detecta qué hay; sin índices se busca con ILIKE
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.connect() as conn:
+            if dialect == "postgresql":
+                available = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+            elif dialect == "sqlite":
+                names = [fts for fts, _ in SEARCH_FIELDS.values()]
+                found = conn.execute(
+                    text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                        ", ".join(f"'{n}'" for n in names)))
+                ).scalar()
+                available = found == len(names)
+            else:
+                available = False
+    except SQLAlchemyError as e:
+        logger.warning("No se pudo detectar la búsqueda indexada: %s", e)
+        available = False
+    _backend = dialect if available else None
+    if not available and dialect in ("postgresql", "sqlite"):
+        logger.warning("Búsqueda indexada no disponible, se usa ILIKE")
+
+def _setup_postgresql(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for model, (_, fields) in SEARCH_FIELDS.items():
+        table = model.__tablename__
+        for field in fields:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{field}_trgm "
+                f"ON {table} USING gin ({field} gin_trgm_ops)"
+            ))
+
+def _setup_sqlite(conn, rebuild: bool = False):
+    for model, (fts, fields) in SEARCH_FIELDS.items():
+        table = model.__tablename__
+        cols = ", ".join(fields)
+        new_vals = ", ".join(f"new.{f}" for f in fields)
+        old_vals = ", ".join(f"old.{f}" for f in fields)
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+        ).first()
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        ))
+        if rebuild or not exists:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+def suspend_sync(conn):
+    # Antes de vaciar o cargar tablas en bloque: sin triggers por fila en SQLite.
+    # setup(engine, rebuild=True) los vuelve a crear y reindexa de una vez.
+    if conn.dialect.name != "sqlite":
+        return
+    for fts, _ in SEARCH_FIELDS.values():
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+        ).first()
+        if not exists:
+            continue
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+
+def _trigrams(q: str) -> List[str]:
+    q = q.lower()
+    return list(dict.fromkeys(q[i:i + 3] for i in range(len(q) - 2)))
+
+def _trigram_query(grams: List[str]) -> str:
+    # OR de trigramas: trae candidatos con el índice FTS; el umbral se aplica después
+    return " OR ".join('"{}"'.format(g.replace('"', '""')) for g in grams)
+
+def _shared(column, grams: List[str]):
+    # Cuántos trigramas de la búsqueda aparecen en el campo
+    value = func.lower(func.coalesce(column, ""))
+    return sum(case((func.instr(value, g) > 0, 1), else_=0) for g in grams)
+
+def apply(query, model, q: str, ranked: bool = True):
+    fts, fields = SEARCH_FIELDS[model]
+    columns = [getattr(model, f) for f in fields]
+    q = q.strip()
+    qlike = f"%{q.lower()}%"
+    like = or_(*[c.ilike(qlike) for c in columns])
+
+    if _backend == "postgresql":
+        needle = literal(q)
+        query = query.filter(or_(like, *[needle.op("<%")(c) for c in columns]))
+        if ranked:
+            scores = [func.word_similarity(needle, func.coalesce(c, "")) for c in columns]
+            rank = func.greatest(*scores) if len(scores) > 1 else scores[0]
+            query = query.order_by(rank.desc())
+        return query
+
+    if _backend == "sqlite" and len(q) >= 3:
+        grams = _trigrams(q)
+        matches = (
+            select(
+                literal_column("rowid").label("id"),
+                literal_column(f"bm25({fts})").label("rank"),
+            )
+            .select_from(text(fts))
+            .where(text(f"{fts} MATCH :fts_q").bindparams(fts_q=_trigram_query(grams)))
+            .subquery()
+        )
+        # Como word_similarity: se exige una parte de los trigramas en un mismo campo,
+        # así un trigrama suelto en común ("ron" en "Ronan" para "iron") no alcanza
+        shared = [_shared(c, grams) for c in columns]
+        best = func.max(*shared) if len(shared) > 1 else shared[0]
+        query = query.join(matches, matches.c.id == model.id).filter(best >= math.ceil(SIMILARITY * len(grams)))
+        if ranked:
+            query = query.order_by(best.desc(), matches.c.rank)
+        return query
+
+    return query.filter(like)
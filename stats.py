@@ -0,0 +1,100 @@
+import copy
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, exists, func, select
+from sqlalchemy.orm import Session
+
+import models
+import versions
+
+TOP_TEAMS = int(os.getenv("STATS_TOP_TEAMS", "10"))
+
+# Las estadísticas dependen de todas las tablas: cualquier escritura sube su versión
+TABLES = versions.ALL_TABLES
+
+_lock = threading.Lock()
+_cached: Optional[Tuple[str, Dict]] = None
+
+def _count(model, *where):
+    return select(func.count()).select_from(model).where(*where).scalar_subquery()
+
+def _totals(db: Session) -> Dict[str, int]:
+    # Todos los contadores en un solo SELECT de subconsultas escalares
+    C, T, I, CT = models.Character, models.Team, models.SecretIdentity, models.CharacterTeam
+    row = db.execute(select(
+        _count(C).label("characters"),
+        _count(C, C.active == True).label("characters_active"),
+        _count(C, ~exists().where(I.character_id == C.id)).label("characters_without_identity"),
+        _count(T).label("teams"),
+        _count(T, T.active == True).label("teams_active"),
+        # Tamaños de equipo: solo equipos activos, igual que _largest_teams
+        _count(T, T.active == True, ~exists().where(CT.team_id == T.id)).label("teams_without_members"),
+        _count(CT, exists().where(T.id == CT.team_id, T.active == True)).label("active_team_relations"),
+        _count(I).label("identities"),
+        _count(CT).label("relations"),
+    )).one()
+    return {k: v or 0 for k, v in row._mapping.items()}
+
+def _by_alignment(db: Session) -> Dict[str, Dict[str, int]]:
+    C = models.Character
+    active = func.sum(case((C.active == True, 1), else_=0))
+    rows = db.execute(select(C.alignment, func.count(), active).group_by(C.alignment).order_by(C.alignment))
+    return {alignment: {"active": a or 0, "deleted": n - (a or 0)} for alignment, n, a in rows}
+
+def _largest_teams(db: Session):
+    T, CT = models.Team, models.CharacterTeam
+    members = func.count(CT.id)
+    rows = db.execute(
+        select(T.id, T.name, members)
+        .outerjoin(CT, CT.team_id == T.id)
+        .where(T.active == True)
+        .group_by(T.id, T.name)
+        .order_by(members.desc(), T.id)
+        .limit(TOP_TEAMS)
+    )
+    return [{"id": id, "name": name, "members": n} for id, name, n in rows]
+
+def compute(db: Session) -> Dict:
+    totals = _totals(db)
+    return {
+        # Claves originales de get_stats, que usa el dashboard: sin los borrados
+        "characters": totals["characters_active"],
+        "teams": totals["teams_active"],
+        "identities": totals["identities"],
+        "relations": totals["relations"],
+        "characters_by_status": {
+            "active": totals["characters_active"],
+            "deleted": totals["characters"] - totals["characters_active"],
+            "total": totals["characters"],
+        },
+        "teams_by_status": {
+            "active": totals["teams_active"],
+            "deleted": totals["teams"] - totals["teams_active"],
+            "total": totals["teams"],
+        },
+        "characters_by_alignment": _by_alignment(db),
+        "characters_without_identity": totals["characters_without_identity"],
+        "team_sizes": {
+            "average": round(totals["active_team_relations"] / totals["teams_active"], 2) if totals["teams_active"] else 0,
+            "empty": totals["teams_without_members"],
+            "largest": _largest_teams(db),
+        },
+    }
+
+def get(db: Session, state: Optional[dict] = None) -> Dict:
+    # Se recalcula solo cuando cambió alguna versión de datos; si no, la
+    # lectura es una consulta a data_versions, sin recorrer las tablas.
+    global _cached
+    if state is None:
+        state = versions.current(db, TABLES)
+    key = versions.fingerprint(state)
+    cached = _cached
+    if cached is None or cached[0] != key:
+        with _lock:
+            cached = _cached
+            if cached is None or cached[0] != key:
+                cached = (key, compute(db))
+                _cached = cached
+    return copy.deepcopy(cached[1])
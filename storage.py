@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+MEDIA_URL = os.getenv("MEDIA_URL", "/media/")
+
+class UploadTooLarge(ValueError):
+    pass
+
+@dataclass
+class StagedUpload:
+    path: str
+    filename: str
+    content_type: str
+    size: int
+    content_hash: str
+
+class Storage(ABC):
+    @abstractmethod
+    def upload(self, src_path: str, dest_path: str, content_type: str) -> Optional[str]:
+        # Copia src_path a dest_path y devuelve la URL pública
+        ...
+
+class SupabaseStorage(Storage):
+    def upload(self, src_path: str, dest_path: str, content_type: str) -> Optional[str]:
+        from supabase_client import upload_image_to_supabase
+        with open(src_path, "rb") as f:
+            return upload_image_to_supabase(f, dest_path, content_type=content_type)
+
+class LocalStorage(Storage):
+    def __init__(self, root: str = MEDIA_ROOT, base_url: str = MEDIA_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/") + "/"
+
+    def upload(self, src_path: str, dest_path: str, content_type: str) -> Optional[str]:
+        target = os.path.join(self.root, *dest_path.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(src_path, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return self.base_url + dest_path
+
+_storage: Optional[Storage] = None
+
+def get_storage() -> Storage:
+    # STORAGE_BACKEND=supabase|local; por defecto Supabase si hay credenciales
+    global _storage
+    if _storage is None:
+        backend = os.getenv("STORAGE_BACKEND")
+        if not backend:
+            backend = "supabase" if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY") else "local"
+        _storage = SupabaseStorage() if backend == "supabase" else LocalStorage()
+    return _storage
+
+def _spool(src, max_bytes: int) -> tuple:
+    # El hash se calcula en la misma pasada que la copia
+    size = 0
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix="upload_")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                dst.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size, digest.hexdigest()
+
+async def stage_upload(image: Optional[UploadFile], max_bytes: Optional[int] = None) -> Optional[StagedUpload]:
+    # Copia por bloques fuera del event loop, sin cargar el archivo en memoria
+    if image is None or not image.filename:
+        return None
+    try:
+        with metrics.track("upload"):
+            path, size, content_hash = await run_in_threadpool(_spool, image.file, max_bytes or MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return StagedUpload(path=path, filename=image.filename, content_type=image.content_type or "application/octet-stream", size=size, content_hash=content_hash)
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+def discard(staged: StagedUpload):
+    try:
+        os.remove(staged.path)
+    except OSError:
+        pass
+
+def submit(fn, *args) -> Future:
+    return _executor.submit(fn, *args)
+
+def save_image_url(setter, entity_id: int) -> Callable[[str], None]:
+    # Callback que abre su propia sesión: corre en el hilo de subida
+    def callback(url: str):
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            setter(db, entity_id, url)
+        finally:
+            db.close()
+    return callback
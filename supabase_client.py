@@ -1,19 +1,34 @@
 import os
-from typing import Optional
-from supabase import create_client
+import threading
+from typing import BinaryIO, Optional, Union
+
+import boot
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "Marvel")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+_client = None
+_lock = threading.Lock()
+
+def get_client():
+    # El SDK (y su cliente HTTP) se crea con la primera subida, no al importar
+    global _client
+    if _client is None and SUPABASE_URL and SUPABASE_KEY:
+        with _lock:
+            if _client is None:
+                with boot.lazy("supabase"):
+                    from supabase import create_client
+                    _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
 
-def upload_image_to_supabase(file_bytes: bytes, dest_path: str, content_type: str = "image/jpeg") -> Optional[str]:
+def upload_image_to_supabase(file_bytes: Union[bytes, BinaryIO], dest_path: str, content_type: str = "image/jpeg") -> Optional[str]:
 
+    supabase = get_client()
     if not supabase:
         return None
     try:
-        supabase.storage.from_(SUPABASE_BUCKET).upload(dest_path, file_bytes, {"content-type": content_type})
+        supabase.storage.from_(SUPABASE_BUCKET).upload(dest_path, file_bytes, {"content-type": content_type, "upsert": "true"})
 
         public_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(dest_path)
         return public_url
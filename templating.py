@@ -0,0 +1,26 @@
+import threading
+
+import boot
+import metrics
+
+class LazyTemplates:
+    # Jinja2 y el entorno de plantillas se crean con la primera página HTML:
+    # los workers que solo sirven /api no pagan ese costo al arrancar
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._templates = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._templates is None:
+            with self._lock:
+                if self._templates is None:
+                    with boot.lazy("templates"):
+                        from fastapi.templating import Jinja2Templates
+                        templates = Jinja2Templates(directory=self.directory)
+                        metrics.instrument_templates(templates)
+                    self._templates = templates
+        return self._templates
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# database lee DATABASE_URL al importarse: la base de pruebas se fija antes
+_tmp = tempfile.mkdtemp(prefix="marvel-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "test.db")
+os.environ["DB_ASYNC"] = "0"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["MEDIA_ROOT"] = os.path.join(_tmp, "media")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def app():
+    import migrations
+    from bench import generate
+    from database import SessionLocal, engine
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        generate.generate(db, 200, 8, seed=7)
+    finally:
+        db.close()
+    import main
+    return main.app
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture
+def db(app):
+    from database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def query_counter():
+    # Cuenta las consultas del bloque y falla si supera el presupuesto o hay un N+1
+    import querycount
+
+    @contextmanager
+    def counter(budget=None, threshold=querycount.N_PLUS_ONE_THRESHOLD):
+        with querycount.capture() as log:
+            yield log
+        log.assert_ok(budget, threshold)
+    return counter
+
+@pytest.fixture(autouse=True)
+def _empty_caches():
+    # Cada prueba parte de la caché fría: el presupuesto vale para el peor caso
+    import cache
+    cache.entities.clear()
+    cache.fragments.clear()
@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import crud
+
+def test_create_relation_with_missing_target_is_400(client):
+    response = client.post("/api/character_team", json={"character_id": 999999, "team_id": 1})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Character or Team not found"
+
+def test_create_duplicate_relation_is_400(client):
+    body = {"character_id": 160, "team_id": 5}
+    client.post("/api/character_team", json=body)
+    response = client.post("/api/character_team", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Relation already exists"
+
+class _PgError(Exception):
+    def __init__(self, pgcode):
+        self.pgcode = pgcode
+
+@pytest.mark.parametrize("orig, kind", [
+    (sqlite3.IntegrityError("UNIQUE constraint failed: character_team.character_id, character_team.team_id"), "unique"),
+    (sqlite3.IntegrityError("FOREIGN KEY constraint failed"), "foreign_key"),
+    (sqlite3.IntegrityError("NOT NULL constraint failed: character_team.team_id"), "other"),
+    (_PgError("23505"), "unique"),
+    (_PgError("23503"), "foreign_key"),
+    (_PgError("23502"), "other"),
+])
+def test_integrity_errors_are_classified(orig, kind):
+    assert crud._violation(IntegrityError("INSERT", {}, orig)) == kind
@@ -0,0 +1,75 @@
+import models
+import versions
+
+def _revalidate(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    return first.headers["etag"]
+
+def test_team_list_with_members_revalidates_after_roster_change(client):
+    url = "/api/teams?fields=id,name&expand=members"
+    etag = _revalidate(client, url)
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.put("/api/teams/1/members", json={"add": [150], "remove": []})
+    assert response.status_code == 200
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    team = next(t for t in fresh.json() if t["id"] == 1)
+    assert 150 in [m["id"] for m in team["members"]]
+
+def test_team_detail_with_members_revalidates_after_member_rename(client):
+    client.put("/api/teams/2/members", json={"add": [151], "remove": []})
+    url = "/api/teams/2?expand=members"
+    etag = _revalidate(client, url)
+
+    assert client.patch("/api/characters/151", json={"alias": "Renombrado"}).status_code == 200
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    member = next(m for m in fresh.json()["members"] if m["id"] == 151)
+    assert member["alias"] == "Renombrado"
+
+def test_team_detail_without_members_ignores_roster_changes(client):
+    url = "/api/teams/3"
+    etag = _revalidate(client, url)
+    client.put("/api/teams/3/members", json={"add": [152], "remove": []})
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+def _write_elsewhere(db, model, row_id, table, **values):
+    # Otra sesión (u otro worker): escribe y sube la versión sin tocar la caché de este proceso
+    db.query(model).filter(model.id == row_id).update(values)
+    versions.bump(db, table)
+    db.commit()
+
+def test_character_detail_reloads_after_write_from_another_session(client, db):
+    url = "/api/characters/20"
+    etag = _revalidate(client, url)
+    _write_elsewhere(db, models.Character, 20, versions.CHARACTERS, alias="Spiderman")
+
+    fresh = client.get(url)
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()["alias"] == "Spiderman"
+    assert client.get(url, headers={"If-None-Match": fresh.headers["etag"]}).status_code == 304
+
+def test_team_and_identity_detail_reload_after_write_from_another_session(client, db):
+    _revalidate(client, "/api/teams/4")
+    _write_elsewhere(db, models.Team, 4, versions.TEAMS, description="Otra sesión")
+    assert client.get("/api/teams/4").json()["description"] == "Otra sesión"
+
+    _revalidate(client, "/api/identities/3")
+    _write_elsewhere(db, models.SecretIdentity, 3, versions.IDENTITIES, place_of_birth="Latveria")
+    assert client.get("/api/identities/3").json()["place_of_birth"] == "Latveria"
+
+def test_cached_detail_still_costs_one_query(client, query_counter):
+    _revalidate(client, "/api/characters/21")
+    with query_counter(budget=1):
+        assert client.get("/api/characters/21").status_code == 200
+
+def test_missing_detail_is_404_despite_preconditions(client):
+    future = "Fri, 01 Jan 2100 00:00:00 GMT"
+    for url in ("/api/characters/999999", "/api/teams/999999", "/api/identities/999999"):
+        assert client.get(url, headers={"If-None-Match": "*"}).status_code == 404
+        assert client.get(url, headers={"If-Modified-Since": future}).status_code == 404
+
+def test_existing_detail_matches_wildcard(client):
+    assert client.get("/api/characters/22", headers={"If-None-Match": "*"}).status_code == 304
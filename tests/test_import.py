@@ -0,0 +1,40 @@
+import json
+
+from sqlalchemy.exc import IntegrityError
+
+import importer
+
+def _ndjson(*rows):
+    return ("\n".join(json.dumps(r) for r in rows) + "\n").encode()
+
+def _import(client, entity, payload):
+    files = {"file": ("rows.ndjson", payload, "application/x-ndjson")}
+    return client.post(f"/api/import/{entity}", files=files)
+
+def test_import_mixes_explicit_and_generated_ids(client):
+    payload = _ndjson(
+        {"name": "Generado Uno", "alignment": "good"},
+        {"id": 9001, "name": "Explícito", "alignment": "evil"},
+        {"name": "Generado Dos", "alignment": "neutral"},
+    )
+    result = _import(client, "characters", payload).json()
+    assert result["inserted"] == 3 and result["error_count"] == 0
+    names = client.get("/api/characters", params={"q": "Generado", "fields": "id,name"}).json()
+    assert {c["name"] for c in names} == {"Generado Uno", "Generado Dos"}
+    assert all(c["id"] != 9001 for c in names)
+    assert client.get("/api/characters/9001").json()["name"] == "Explícito"
+
+def test_import_reports_integrity_errors_per_row(client, monkeypatch):
+    insert = importer.bulk_insert
+
+    def reject_bad_rows(db, model, rows):
+        if any(r["name"] == "Equipo Malo" for r in rows):
+            raise IntegrityError("INSERT", {}, Exception("duplicate key value"))
+        insert(db, model, rows)
+    monkeypatch.setattr(importer, "bulk_insert", reject_bad_rows)
+    payload = _ndjson({"name": "Equipo Bueno"}, {"name": "Equipo Malo"}, {"name": "Equipo Mejor"})
+    response = _import(client, "teams", payload)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 2
+    assert result["errors"] == [{"row": 2, "error": "duplicate key value"}]
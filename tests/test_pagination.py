@@ -0,0 +1,22 @@
+import pytest
+
+from pagination import encode_cursor
+
+LISTS = ["/api/characters", "/api/teams", "/api/identities", "/api/character_team"]
+
+@pytest.mark.parametrize("url", LISTS)
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"limit": 1001}, {"skip": -5},
+                                    {"limit": -1, "after": encode_cursor(1)}])
+def test_list_rejects_out_of_range_params(client, url, params):
+    assert client.get(url, params=params).status_code == 422
+
+@pytest.mark.parametrize("url", LISTS)
+def test_cursor_pages_do_not_overlap(client, url):
+    first = client.get(url, params={"limit": 3, "after": ""}).json()
+    second = client.get(url, params={"limit": 3, "after": first["next_cursor"]}).json()
+    assert len(first["items"]) == 3
+    assert first["items"][-1]["id"] < second["items"][0]["id"]
+
+@pytest.mark.parametrize("url", ["/", "/characters", "/teams"])
+def test_pages_reject_negative_skip(client, url):
+    assert client.get(url, params={"q": "a", "skip": -5}).status_code == 422
@@ -0,0 +1,49 @@
+import pytest
+from starlette.routing import Match
+
+from pagination import encode_cursor
+
+# Cada lectura se ejecuta con la caché fría y el presupuesto de su propio endpoint
+URLS = [
+    "/api/characters",
+    "/api/characters?limit=20&skip=20",
+    "/api/characters?limit=20&after=" + encode_cursor(10),
+    "/api/characters?q=Stark",
+    "/api/characters?fields=id,name&expand=teams",
+    "/api/characters/1",
+    "/api/characters/1?fields=alias&expand=identity",
+    "/api/teams",
+    "/api/teams?q=Avengers",
+    "/api/teams?fields=id,name&expand=members",
+    "/api/teams/1",
+    "/api/teams/1?expand=members",
+    "/api/identities",
+    "/api/identities?limit=20&after=" + encode_cursor(10),
+    "/api/identities/1",
+    "/api/character_team",
+    "/api/character_team?fields=id&expand=character,team",
+    "/api/report/stats",
+    "/",
+    "/characters",
+    "/characters?q=Stark",
+    "/teams",
+    "/identities",
+    "/character_team/list",
+    "/dashboard",
+]
+
+def _budget(app, path):
+    scope = {"type": "http", "path": path, "method": "GET"}
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.endpoint.query_budget
+    raise AssertionError(f"{path} no tiene presupuesto de consultas")
+
+@pytest.mark.parametrize("url", URLS)
+def test_query_budget(app, client, query_counter, url):
+    budget, threshold = _budget(app, url.split("?")[0])
+    with query_counter(budget=budget, threshold=threshold) as log:
+        response = client.get(url)
+    assert response.status_code == 200, response.text
+    assert log.count > 0
@@ -0,0 +1,41 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import querycount
+from database import engine
+
+def _client(monkeypatch):
+    monkeypatch.setattr(querycount, "MODE", "raise")
+    querycount.install()
+    app = FastAPI()
+    app.add_middleware(querycount.QueryCheckMiddleware)
+
+    @app.get("/dentro")
+    @querycount.query_budget(1)
+    def dentro():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    @app.get("/excedido")
+    @querycount.query_budget(1)
+    def excedido():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_raise_mode_keeps_responses_within_budget(app, monkeypatch):
+    response = _client(monkeypatch).get("/dentro")
+    assert response.status_code == 200
+    assert response.headers["x-query-count"] == "1"
+
+def test_raise_mode_replaces_response_before_it_starts(app, monkeypatch):
+    # El cliente recibe un 500, no un 200 seguido de una excepción
+    response = _client(monkeypatch).get("/excedido")
+    assert response.status_code == 500
+    assert "GET /excedido" in response.text
+    assert "2 consultas (presupuesto 1)" in response.text
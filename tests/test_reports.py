@@ -0,0 +1,52 @@
+import io
+import os
+import time
+
+import reports
+
+def test_flowables_are_consumed_lazily():
+    # ReportLab debe pedir flowables a medida que dibuja: si copiara o
+    # recorriera la lista entera antes, el reporte cargaría todo en memoria
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Flowable, SimpleDocTemplate
+
+    drawn = []
+    pending = []
+
+    class Row(Flowable):
+        def wrap(self, available_width, available_height):
+            return available_width, 20
+
+        def draw(self):
+            drawn.append(self)
+
+    def story(n):
+        for _ in range(n):
+            pending.append(len(pending) - len(drawn))
+            yield Row()
+
+    lookahead = 8
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=letter)
+    doc.build(reports._StreamedFlowables(story(2000), lookahead=lookahead))
+    assert len(drawn) == 2000
+    assert max(pending) <= lookahead + 1
+
+def test_report_is_cached_by_key(app, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, "REPORT_CACHE_DIR", str(tmp_path))
+    ruta = reports.reporte_cacheado(db, "a")
+    with open(ruta, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    assert reports.reporte_cacheado(db, "a") == ruta
+
+def test_purge_spares_reports_served_within_grace(tmp_path, monkeypatch):
+    # Un PDF recién devuelto por reporte_cacheado puede estar aún por abrirse
+    monkeypatch.setattr(reports, "REPORT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(reports, "REPORT_CACHE_KEEP", 1)
+    viejo = time.time() - reports.REPORT_CACHE_GRACE - 60
+    for clave, fecha in (("nuevo", None), ("servido", None), ("antiguo", viejo)):
+        ruta = tmp_path / f"reporte_{clave}.pdf"
+        ruta.write_bytes(b"%PDF-")
+        if fecha is not None:
+            os.utime(ruta, (fecha, fecha))
+    reports._purge_reportes(str(tmp_path / "reporte_nuevo.pdf"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["reporte_nuevo.pdf", "reporte_servido.pdf"]
@@ -0,0 +1,41 @@
+import pytest
+
+CATALOG = [
+    ("Tony Stark", "Iron Man"),
+    ("Ronan", "The Accuser"),
+    ("Aaron Davis", "Prowler"),
+    ("Peter Parker", "Spider-Man"),
+    ("Scott Lang", "Ant-Man"),
+]
+
+@pytest.fixture(scope="module")
+def created(client):
+    ids = {}
+    for name, alias in CATALOG:
+        response = client.post("/api/characters", data={"name": name, "alias": alias, "alignment": "good"})
+        ids[name] = response.json()["id"]
+    return ids
+
+def _found(client, created, q):
+    response = client.get("/api/characters", params={"q": q, "fields": "id", "limit": 1000})
+    assert response.status_code == 200
+    ids = {item["id"] for item in response.json()}
+    return {name for name, character_id in created.items() if character_id in ids}
+
+@pytest.mark.parametrize("q, expected", [
+    ("iron", {"Tony Stark"}),
+    ("Parker", {"Peter Parker"}),
+    ("spider-man", {"Peter Parker"}),
+    ("spidr-man", {"Peter Parker"}),
+    ("ant-man", {"Scott Lang"}),
+])
+def test_search_requires_most_trigrams(client, created, q, expected):
+    assert _found(client, created, q) == expected
+
+def test_search_ranks_closest_match_first(client, created):
+    response = client.get("/api/characters", params={"q": "Peter Parker", "fields": "id", "limit": 5})
+    assert response.json()[0]["id"] == created["Peter Parker"]
+
+def test_sqlite_uses_indexed_search(client):
+    import search
+    assert search._backend in ("sqlite", "postgresql")
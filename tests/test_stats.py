@@ -0,0 +1,16 @@
+import models
+
+def test_stats_headline_and_team_sizes_ignore_deleted_rows(client, db):
+    stats = client.get("/api/report/stats").json()
+    C, T, CT = models.Character, models.Team, models.CharacterTeam
+    active_characters = db.query(C).filter(C.active == True).count()
+    active_teams = db.query(T).filter(T.active == True).count()
+    assert stats["characters"] == stats["characters_by_status"]["active"] == active_characters
+    assert stats["teams"] == stats["teams_by_status"]["active"] == active_teams
+    assert stats["characters_by_status"]["total"] == db.query(C).count()
+
+    active_ids = [t.id for t in db.query(T.id).filter(T.active == True)]
+    members = db.query(CT).filter(CT.team_id.in_(active_ids)).count()
+    assert stats["team_sizes"]["average"] == round(members / active_teams, 2)
+    empty = [i for i in active_ids if not db.query(CT).filter(CT.team_id == i).count()]
+    assert stats["team_sizes"]["empty"] == len(empty)
@@ -0,0 +1,16 @@
+import pytest
+
+import storage
+
+def test_backend_without_upload_fails_on_creation():
+    class Incomplete(storage.Storage):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_local_storage_copies_and_returns_url(tmp_path):
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"imagen")
+    backend = storage.LocalStorage(root=str(tmp_path / "media"), base_url="/media")
+    assert backend.upload(str(src), "ab/cd.webp", "image/webp") == "/media/ab/cd.webp"
+    assert (tmp_path / "media" / "ab" / "cd.webp").read_bytes() == b"imagen"
@@ -0,0 +1,92 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import models
+
+CHARACTERS = models.Character.__tablename__
+TEAMS = models.Team.__tablename__
+IDENTITIES = models.SecretIdentity.__tablename__
+CHARACTER_TEAM = models.CharacterTeam.__tablename__
+ALL_TABLES = (CHARACTERS, TEAMS, IDENTITIES, CHARACTER_TEAM)
+
+# Tablas de las que depende cada forma de respuesta
+CHARACTER_TABLES = ALL_TABLES
+TEAM_TABLES = (TEAMS,)
+TEAM_MEMBERS_TABLES = (TEAMS, CHARACTERS, CHARACTER_TEAM)  # ?expand=members
+IDENTITY_TABLES = (IDENTITIES,)
+CHARACTER_TEAM_TABLES = ALL_TABLES
+REPORT_TABLES = ALL_TABLES
+# Páginas HTML: los equipos muestran sus miembros y las identidades el personaje
+TEAM_PAGE_TABLES = ALL_TABLES
+IDENTITY_PAGE_TABLES = (IDENTITIES, CHARACTERS)
+
+def setup(bind):
+    # bind: engine o conexión (las migraciones lo llaman dentro de su transacción)
+    with Session(bind) as db:
+        existing = {r[0] for r in db.query(models.DataVersion.table_name).all()}
+        for table in ALL_TABLES:
+            if table not in existing:
+                db.add(models.DataVersion(table_name=table, version=0, updated_at=datetime.utcnow()))
+        db.commit()
+
+def bump(db: Session, *tables: str):
+    # Se ejecuta dentro de la transacción de la escritura, antes del commit
+    now = datetime.utcnow()
+    for table in dict.fromkeys(tables):
+        result = db.execute(
+            update(models.DataVersion)
+            .where(models.DataVersion.table_name == table)
+            .values(version=models.DataVersion.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.add(models.DataVersion(table_name=table, version=1, updated_at=now))
+
+def current(db: Session, tables: Iterable[str]) -> Dict[str, Tuple[int, datetime]]:
+    rows = db.query(models.DataVersion).filter(models.DataVersion.table_name.in_(tuple(tables))).all()
+    return {r.table_name: (r.version, r.updated_at) for r in rows}
+
+def fingerprint(state: Dict[str, Tuple[int, datetime]], *extra: str) -> str:
+    parts = list(extra) + [f"{t}:{state[t][0]}" for t in sorted(state)]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+def make_etag(request: Request, state: Dict[str, Tuple[int, datetime]]) -> str:
+    # Se deriva de la URL y las versiones, nunca del cuerpo ya renderizado
+    return '"' + fingerprint(state, request.url.path, str(request.url.query)) + '"'
+
+def _last_modified(state: Dict[str, Tuple[int, datetime]]) -> Optional[datetime]:
+    stamps = [ts for _, ts in state.values() if ts is not None]
+    if not stamps:
+        return None
+    return max(stamps).replace(tzinfo=timezone.utc, microsecond=0)
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def conditional_get(request: Request, response: Response, db: Session, tables: Iterable[str], state: Optional[dict] = None) -> Optional[Response]:
+    if state is None:
+        state = current(db, tables)
+    etag = make_etag(request, state)
+    last_modified = _last_modified(state)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return None
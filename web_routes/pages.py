@@ -1,28 +1,73 @@
-from fastapi import APIRouter, Request, Depends, UploadFile, File, Form
+import os
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import APIRouter, Request, Depends, UploadFile, File, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
+from markupsafe import Markup
 from sqlalchemy.orm import Session
-import crud, schemas
+import crud, crud_async, models, schemas
 from database import get_db
-from supabase_client import upload_image_to_supabase
+import cache
+import fieldsets
+import images
+import listings
+import pagination
+import storage
+import versions
+from querycount import query_budget
 
 router = APIRouter(tags=["Web Pages"])
 
+PAGE_SIZE = int(os.getenv("HTML_PAGE_SIZE", "50"))
+
+def _page(request: Request, load, q: str = "", after: Optional[str] = None, skip: int = 0) -> dict:
+    # Sin búsqueda, keyset por id como en la API. Con búsqueda se conserva el
+    # orden por relevancia y se pagina por desplazamiento.
+    if q:
+        items = load(q=q, skip=skip, limit=PAGE_SIZE + 1)
+    else:
+        items = load(after_id=pagination.decode_cursor(after or ""), limit=PAGE_SIZE + 1)
+    page = pagination.build_page(items, PAGE_SIZE)
+    path = request.url.path
+    page["next_url"] = None
+    if page["next_cursor"]:
+        params = {"q": q, "skip": skip + PAGE_SIZE} if q else {"after": page["next_cursor"]}
+        page["next_url"] = f"{path}?{urlencode(params)}"
+    page["first_url"] = (f"{path}?{urlencode({'q': q})}" if q else path) if after or skip else None
+    return page
+
+def _fragment(request: Request, db: Session, name: str, tables, params: tuple, context) -> Markup:
+    # El HTML de la tabla se guarda con la huella de versiones en la clave:
+    # mientras no cambien los datos, una página repetida cuesta una consulta
+    key = (name, params, versions.fingerprint(versions.current(db, tables)))
+    html = cache.fragments.get(key)
+    if html is cache.MISSING:
+        template = request.app.state.templates.get_template(f"fragments/{name}.html")
+        html = Markup(template.render(**context()))
+        cache.fragments.set(key, html)
+    return html
+
 # -------------------- HOME --------------------
 @router.get("/", response_class=HTMLResponse)
-def home(request: Request, db: Session = Depends(get_db), q: str = ""):
-    characters = crud.get_characters(db, q=q)
+@query_budget(8)
+def home(request: Request, db: Session = Depends(get_db), q: str = "", after: Optional[str] = None, skip: int = Query(0, ge=0)):
+    fragment = _fragment(request, db, "home_cards", versions.CHARACTER_TABLES, (q, after, skip),
+                         lambda: {"page": _page(request, lambda **kw: crud.get_characters(db, **kw), q, after, skip)})
     return request.app.state.templates.TemplateResponse("index.html", {
         "request": request,
-        "characters": characters
+        "fragment": fragment
     })
 
 # -------------------- PERSONAJES --------------------
 @router.get("/characters", response_class=HTMLResponse)
-def characters_page(request: Request, db: Session = Depends(get_db), q: str = ""):
-    characters = crud.get_characters(db, q=q)
+@query_budget(8)
+def characters_page(request: Request, db: Session = Depends(get_db), q: str = "", after: Optional[str] = None, skip: int = Query(0, ge=0)):
+    fragment = _fragment(request, db, "characters_table", versions.CHARACTER_TABLES, (q, after, skip),
+                         lambda: {"page": _page(request, lambda **kw: crud.get_characters(db, **kw), q, after, skip)})
     return request.app.state.templates.TemplateResponse("characters_list.html", {
         "request": request,
-        "characters": characters,
+        "fragment": fragment,
         "q": q
     })
 
@@ -40,13 +85,7 @@ async def create_character(
     image: UploadFile = File(None),
     db: Session = Depends(get_db)
 ):
-    image_filename = None
-    image_url = None
-    if image:
-        content = await image.read()
-        safe_name = f"characters/{name.replace(' ', '_')}_{image.filename}"
-        image_url = upload_image_to_supabase(content, safe_name, content_type=image.content_type)
-        image_filename = image.filename
+    staged = await storage.stage_upload(image)
 
     character_data = schemas.CharacterCreate(
         name=name,
@@ -55,13 +94,19 @@ async def create_character(
         description=description,
         active=True
     )
-    crud.create_character(db, character_data, image_filename=image_filename, image_url=image_url)
+    created = await crud_async.create_character(db, character_data, image_filename=staged.filename if staged else None)
+    if staged:
+        images.enqueue(
+            staged,
+            storage.save_image_url(crud.set_character_image, created.id),
+        )
     return RedirectResponse(url="/characters", status_code=303)
 
 # -------------------- EDITAR PERSONAJE --------------------
 @router.get("/characters/edit/{character_id}", response_class=HTMLResponse)
 def edit_character_page(request: Request, character_id: int, db: Session = Depends(get_db)):
-    character = crud.get_character(db, character_id)
+    # El formulario solo muestra columnas propias: sin identidad ni equipos
+    character = db.get(models.Character, character_id)
     if not character:
         return HTMLResponse("Personaje no encontrado", status_code=404)
     return request.app.state.templates.TemplateResponse("characters_edit.html", {
@@ -80,34 +125,29 @@ async def edit_character(
     image: UploadFile = File(None),
     db: Session = Depends(get_db)
 ):
-    character_data = schemas.CharacterCreate(
+    character_data = schemas.CharacterUpdate(
         name=name,
         alias=alias,
         alignment=alignment,
         description=description,
-        active=True
     )
 
-    image_filename = None
-    image_url = None
-    if image:
-        content = await image.read()
-        safe_name = f"characters/{name.replace(' ', '_')}_{image.filename}"
-        image_url = upload_image_to_supabase(content, safe_name, content_type=image.content_type)
-        image_filename = image.filename
+    staged = await storage.stage_upload(image)
 
-    db_character = crud.get_character(db, character_id)
-    if not db_character:
+    # Un solo UPDATE con los campos del formulario (y el archivo, si se subió uno)
+    changes = character_data.dict(exclude_unset=True)
+    if staged:
+        changes["image_filename"] = staged.filename
+    updated_character = await crud_async.update_character(db, character_id, changes)
+    if not updated_character:
+        if staged:
+            storage.discard(staged)
         return HTMLResponse("Personaje no encontrado", status_code=404)
-
-    # Actualizamos los campos
-    updated_character = crud.update_character(db, character_id, character_data)
-    if image_filename:
-        updated_character.image_filename = image_filename
-    if image_url:
-        updated_character.image_url = image_url
-    db.commit()
-    db.refresh(updated_character)
+    if staged:
+        images.enqueue(
+            staged,
+            storage.save_image_url(crud.set_character_image, character_id),
+        )
 
     return RedirectResponse(url="/characters", status_code=303)
 
@@ -118,11 +158,13 @@ def delete_character_page(character_id: int, db: Session = Depends(get_db)):
 
 # -------------------- EQUIPOS --------------------
 @router.get("/teams", response_class=HTMLResponse)
-def teams_page(request: Request, db: Session = Depends(get_db), q: str = ""):
-    teams = crud.get_teams(db, q=q)
+@query_budget(5)
+def teams_page(request: Request, db: Session = Depends(get_db), q: str = "", after: Optional[str] = None, skip: int = Query(0, ge=0)):
+    fragment = _fragment(request, db, "teams_table", versions.TEAM_PAGE_TABLES, (q, after, skip),
+                         lambda: {"page": _page(request, lambda **kw: crud.get_teams(db, with_members=True, **kw), q, after, skip)})
     return request.app.state.templates.TemplateResponse("teams_list.html", {
         "request": request,
-        "teams": teams,
+        "fragment": fragment,
         "q": q
     })
 
@@ -139,13 +181,7 @@ async def create_team_page(
     image: UploadFile = File(None),
     db: Session = Depends(get_db)
 ):
-    image_filename = None
-    image_url = None
-    if image:
-        content = await image.read()
-        safe_name = f"teams/{name.replace(' ', '_')}_{image.filename}"
-        image_url = upload_image_to_supabase(content, safe_name, content_type=image.content_type)
-        image_filename = image.filename
+    staged = await storage.stage_upload(image)
 
     team_schema = schemas.TeamCreate(
         name=name,
@@ -154,25 +190,29 @@ async def create_team_page(
         active=True
     )
 
-    crud.create_team(db, team_schema, image_filename=image_filename, image_url=image_url)
+    created = await crud_async.create_team(db, team_schema, image_filename=staged.filename if staged else None)
+    if staged:
+        images.enqueue(
+            staged,
+            storage.save_image_url(crud.set_team_image, created.id),
+        )
     return RedirectResponse(url="/teams", status_code=303)
 
 # -------------------- IDENTIDADES --------------------
 @router.get("/identities", response_class=HTMLResponse)
-def identities_page(request: Request, db: Session = Depends(get_db)):
-    identities = crud.get_identities(db)
+@query_budget(4)
+def identities_page(request: Request, db: Session = Depends(get_db), after: Optional[str] = None):
+    fragment = _fragment(request, db, "identities_table", versions.IDENTITY_PAGE_TABLES, (after,),
+                         lambda: {"page": _page(request, lambda **kw: crud.get_identities(db, with_character=True, **kw), after=after)})
     return request.app.state.templates.TemplateResponse("identities_list.html", {
         "request": request,
-        "identities": identities
+        "fragment": fragment
     })
 
 @router.get("/identities/new", response_class=HTMLResponse)
-def identity_new_page(request: Request, db: Session = Depends(get_db)):
-    characters = crud.get_characters(db)
-    return request.app.state.templates.TemplateResponse(
-        "identities_new.html",
-        {"request": request, "characters": characters}
-    )
+def identity_new_page(request: Request):
+    # El personaje se elige con el buscador, que pagina contra /api/characters
+    return request.app.state.templates.TemplateResponse("identities_new.html", {"request": request})
 
 @router.post("/identities/new")
 def create_identity_page(
@@ -193,22 +233,22 @@ def create_identity_page(
     return RedirectResponse(url="/identities", status_code=303)
 
 # -------------------- RELACIÓN PERSONAJE-EQUIPO --------------------
+# La tabla solo muestra nombres: resúmenes de listings en vez de entidades completas
+RELATION_PAGE_SELECTION = fieldsets.Selection(("id",), frozenset({"character", "team"}))
+
 @router.get("/character_team/list", response_class=HTMLResponse)
-def character_team_list_page(request: Request, db: Session = Depends(get_db)):
-    relations = crud.get_character_teams(db)
+@query_budget(4)
+def character_team_list_page(request: Request, db: Session = Depends(get_db), after: Optional[str] = None):
+    fragment = _fragment(request, db, "character_team_table", versions.CHARACTER_TEAM_TABLES, (after,),
+                         lambda: {"page": _page(request, lambda **kw: listings.character_teams(db, RELATION_PAGE_SELECTION, **kw), after=after)})
     return request.app.state.templates.TemplateResponse(
         "character_team_list.html",
-        {"request": request, "relations": relations}
+        {"request": request, "fragment": fragment}
     )
 
 @router.get("/character_team/new", response_class=HTMLResponse)
-def character_team_new_page(request: Request, db: Session = Depends(get_db)):
-    characters = crud.get_characters(db)
-    teams = crud.get_teams(db)
-    return request.app.state.templates.TemplateResponse(
-        "character_team_new.html",
-        {"request": request, "characters": characters, "teams": teams}
-    )
+def character_team_new_page(request: Request):
+    return request.app.state.templates.TemplateResponse("character_team_new.html", {"request": request})
 
 @router.post("/character_team/new")
 def create_character_team_page(
@@ -223,6 +263,7 @@ def create_character_team_page(
 
 # -------------------- DASHBOARD --------------------
 @router.get("/dashboard", response_class=HTMLResponse)
+@query_budget(6)
 def dashboard(request: Request, db: Session = Depends(get_db)):
     stats = crud.get_stats(db)
     return request.app.state.templates.TemplateResponse("dashboard.html", {